@@ -0,0 +1,341 @@
+import argparse
+import csv
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Iterator, Optional, TextIO
+
+from date_codec import parse_date
+from series_registry import DEFAULT_SERIES_ID
+
+# Rows per chunk for cached (--cache) and multi-process (--workers) runs
+DEFAULT_CHUNK_SIZE = 2000
+
+
+@dataclass
+class BatchStats:
+    rows: int = 0
+    rejected: int = 0
+    elapsed_seconds: float = 0.0
+    cache_hits: int = 0             # rows answered by the result cache (--cache)
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.rows / self.elapsed_seconds
+
+
+## Raised for a single bad input row. The batch run records it in the reject stream and moves on.
+class RowError(ValueError):
+    pass
+
+
+## Picks "csv" or "jsonl" from an explicit format or the file extension. Stdin defaults to csv.
+def detect_format(path: Optional[str], fmt: Optional[str] = None) -> str:
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported format '{fmt}'. Use 'csv' or 'jsonl'.")
+        return fmt
+    if path and path.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+## Yields (line_number, row) one at a time so the whole file is never held in memory.
+## A JSONL line that is not valid JSON is yielded as a RowError instead of a row.
+def read_rows(stream: TextIO, fmt: str) -> Iterator[tuple[int, object]]:
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start = 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, RowError(f"Invalid JSON: {e.msg}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, RowError("Each JSON line must be an object")
+            continue
+        yield line_number, row
+
+
+def _parse_date(row: dict, field: str) -> date:
+    value = row.get(field)
+    if value is None or str(value).strip() == "":
+        raise RowError(f"Missing {field}")
+    try:
+        return parse_date(str(value).strip())
+    except ValueError:
+        raise RowError(f"Invalid {field} '{value}'. Please use MM/DD/YYYY.") from None
+
+
+## Parses a principal such as 1234.56, "1,234.56" or "$1234.56". It must be a finite amount of 0 or more.
+def parse_principal(value) -> float:
+    if value is None or str(value).strip() == "":
+        raise RowError("Missing principal")
+    try:
+        principal = float(str(value).strip().replace(",", "").lstrip("$"))
+    except ValueError:
+        raise RowError(f"Invalid principal '{value}'") from None
+    if not math.isfinite(principal) or principal < 0:
+        raise RowError(f"Invalid principal '{value}'. It must be a finite amount of 0 or more.")
+    return principal
+
+
+## argparse `type=` for a principal on the command line, with the same checks as input rows.
+def parse_principal_arg(value: str) -> float:
+    try:
+        return parse_principal(value)
+    except RowError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+## Turns a raw input row into calculate_interest arguments.
+## judgment_date is optional and defaults to start_date, same as the interactive calculator.
+def parse_row(row: dict) -> tuple[float, date, date, date]:
+    principal = parse_principal(row.get("principal"))
+    start_date = _parse_date(row, "start_date")
+    end_date = _parse_date(row, "end_date")
+    if row.get("judgment_date") is None or str(row.get("judgment_date")).strip() == "":
+        judgment_date = start_date
+    else:
+        judgment_date = _parse_date(row, "judgment_date")
+
+    if end_date < start_date:
+        raise RowError("end_date is before start_date")
+
+    return principal, start_date, end_date, judgment_date
+
+
+## Interest for one parsed input row. The optional "series" column picks the rate series; rows without one
+## use the default (Florida post-judgment) series.
+def calculate_row(app, row: dict) -> float:
+    principal, start_date, end_date, judgment_date = parse_row(row)
+    series_id = str(row.get("series") or "").strip()
+    if series_id:
+        return app.calculate_interest(principal, start_date, end_date, judgment_date, series_id = series_id)
+    return app.calculate_interest(principal, start_date, end_date, judgment_date)
+
+
+## One line of the reject stream.
+def reject_line(line_number: int, error: Exception, row) -> str:
+    return json.dumps({
+        "line": line_number,
+        "error": str(error),
+        "row": None if isinstance(row, RowError) else row,
+    }) + "\n"
+
+
+## Groups (line_number, row) pairs into lists of up to `size`.
+def iter_chunks(rows: Iterable[tuple[int, object]], size: int) -> Iterator[list[tuple[int, object]]]:
+    chunk = []
+    for item in rows:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+## Calculates a chunk of (line_number, row) pairs through a ResultCache (result_cache.py): the whole chunk is
+## looked up at once, and only the rows not found are calculated and then stored.
+## Returns (line_number, row, interest, error) for every pair, in order; interest is None for rejected rows.
+def calculate_rows_cached(app, cache, rows: list[tuple[int, object]]) -> list[tuple[int, object, Optional[float],
+                                                                                  Optional[Exception]]]:
+    from result_cache import calculate_interest_cached
+
+    parsed = []
+    for line_number, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            principal, start_date, end_date, judgment_date = parse_row(row)
+            series_id = str(row.get("series") or "").strip() or DEFAULT_SERIES_ID
+            parsed.append((line_number, row, (series_id, principal, start_date, end_date, judgment_date), None))
+        except (RowError, ValueError) as e:
+            parsed.append((line_number, row, None, e))
+
+    interest = iter(calculate_interest_cached(app, cache, [case for _, _, case, _ in parsed if case is not None],
+                                              errors = "return"))
+    results = []
+    for line_number, row, case, error in parsed:
+        result = next(interest) if case is not None else None
+        if isinstance(result, Exception):
+            result, error = None, result
+        results.append((line_number, row, result, error))
+    return results
+
+
+## Streams rows from in_stream through app.calculate_interest and writes each result as soon as it is computed.
+## Output rows are the input rows plus an "interest" field, in the same format as the input.
+## Bad rows go to reject_stream as JSON lines ({"line", "error", "row"}) and never abort the run.
+## With watch_rates=N, the rate tables are checked every N rows and reloaded if they changed, so a long run
+## picks up a new rate without restarting; rows already written keep the rates they were computed with.
+## With a ResultCache, rows are read in chunks of chunk_size and looked up in the cache a chunk at a time;
+## only rows the cache does not have are calculated.
+def run_batch(app, in_stream: TextIO, out_stream: TextIO, reject_stream: TextIO, fmt: str = "csv",
+              watch_rates: int = 0, cache = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> BatchStats:
+    stats = BatchStats()
+    writer = None
+    started = time.perf_counter()
+    hits_before = cache.stats.hits if cache is not None else 0
+
+    def counted(rows: Iterable[tuple[int, object]]) -> Iterator[tuple[int, object]]:
+        for item in rows:
+            stats.rows += 1
+            if watch_rates and stats.rows % watch_rates == 0:
+                try:
+                    app.reload_rates_if_changed()
+                except (OSError, ValueError) as e:
+                    print(f"Rates not reloaded: {e}", file = sys.stderr)
+            yield item
+
+    def calculated() -> Iterator[tuple[int, object, Optional[float], Optional[Exception]]]:
+        rows = counted(read_rows(in_stream, fmt))
+        if cache is not None:
+            for chunk in iter_chunks(rows, chunk_size):
+                yield from calculate_rows_cached(app, cache, chunk)
+            return
+        for line_number, row in rows:
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                yield line_number, row, calculate_row(app, row), None
+            except (RowError, ValueError, OverflowError) as e:
+                yield line_number, row, None, e
+
+    for line_number, row, interest, error in calculated():
+        if error is not None:
+            stats.rejected += 1
+            reject_stream.write(reject_line(line_number, error, row))
+            continue
+
+        if fmt == "csv":
+            if writer is None:
+                fieldnames = list(row.keys())
+                if "interest" not in fieldnames:
+                    fieldnames.append("interest")
+                writer = csv.DictWriter(out_stream, fieldnames = fieldnames, extrasaction = "ignore")
+                writer.writeheader()
+            writer.writerow({**row, "interest": f"{interest:.2f}"})
+        else:
+            out_stream.write(json.dumps({**row, "interest": interest}) + "\n")
+
+    if cache is not None:
+        stats.cache_hits = cache.stats.hits - hits_before
+    stats.elapsed_seconds = time.perf_counter() - started
+    return stats
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog = "batch",
+        description = "Compute post-judgment interest for a CSV or JSONL file of judgments.",
+    )
+    parser.add_argument("input", nargs = "?", default = "-",
+                        help = "Input file (.csv or .jsonl). Use '-' or omit for stdin.")
+    parser.add_argument("-o", "--output", default = "-", help = "Output file. Defaults to stdout.")
+    parser.add_argument("-r", "--rejects", default = None, help = "Reject file (JSON lines). Defaults to stderr.")
+    parser.add_argument("-f", "--format", choices = ("csv", "jsonl"), default = None,
+                        help = "Input/output format. Detected from the file extension if omitted.")
+    parser.add_argument("--watch-rates", type = int, default = 0, metavar = "ROWS",
+                        help = "Reload the rate tables every ROWS rows if they changed.")
+    parser.add_argument("-j", "--workers", type = int, default = 1,
+                        help = "Worker processes (0 = one per CPU). Defaults to 1, calculating in this process.")
+    parser.add_argument("--chunk-size", type = int, default = DEFAULT_CHUNK_SIZE, metavar = "ROWS",
+                        help = "Rows sent to a worker, or looked up in the cache, at a time.")
+    parser.add_argument("--cache", default = None, metavar = "PATH",
+                        help = "SQLite result cache. Rows calculated by an earlier run with the same rates are "
+                               "read from it instead of calculated.")
+    parser.add_argument("--cache-days", type = float, default = None, metavar = "DAYS",
+                        help = "Days a cached result stays valid (default 30).")
+    return parser
+
+
+## Opens a file named on the command line. None or "-" gives `default` (sys.stdin, sys.stdout or sys.stderr).
+def open_stream(path: Optional[str], mode: str, default: TextIO) -> TextIO:
+    if path is None or path == "-":
+        return default
+    return open(path, mode, newline = "", encoding = "utf-8")
+
+
+## Closes streams from open_stream, leaving stdin, stdout, stderr and None alone.
+def close_streams(*streams: Optional[TextIO]) -> None:
+    for stream in streams:
+        if stream is not None and stream not in (sys.stdin, sys.stdout, sys.stderr):
+            stream.close()
+
+
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.workers < 0:
+        parser.error("--workers must be 0 or more")
+    if args.workers != 1 and args.watch_rates:
+        parser.error("--watch-rates cannot be used with --workers; workers share the rates loaded at start")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.cache_days is not None and args.cache_days <= 0:
+        parser.error("--cache-days must be positive")
+    fmt = detect_format(None if args.input == "-" else args.input, args.format)
+
+    if app is None:
+        from main import App
+        app = App()
+
+    cache = None
+    if args.cache:
+        from result_cache import DEFAULT_MAX_AGE_DAYS, ResultCache
+
+        cache = ResultCache(args.cache, args.cache_days or DEFAULT_MAX_AGE_DAYS)
+        # Only expired entries: other processes may still be running with other rates
+        cache.prune()
+
+    in_stream = open_stream(args.input, "r", sys.stdin)
+    out_stream = open_stream(args.output, "w", sys.stdout)
+    reject_stream = open_stream(args.rejects, "w", sys.stderr)
+    try:
+        if args.workers == 1:
+            stats = run_batch(app, in_stream, out_stream, reject_stream, fmt, watch_rates = args.watch_rates,
+                              cache = cache, chunk_size = args.chunk_size)
+        else:
+            from parallel import run_batch_parallel
+
+            stats = run_batch_parallel(app, in_stream, out_stream, reject_stream, fmt, workers = args.workers,
+                                       chunk_size = args.chunk_size, cache = cache)
+    finally:
+        close_streams(in_stream, out_stream, reject_stream)
+        if cache is not None:
+            cache.close()
+
+    print(
+        f"Processed {stats.rows} rows ({stats.rejected} rejected) "
+        f"in {stats.elapsed_seconds:.3f}s - {stats.rows_per_second:,.0f} rows/sec",
+        file = sys.stderr,
+    )
+    if cache is not None:
+        print(f"  cache: {stats.cache_hits} of {stats.rows - stats.rejected} rows found in {args.cache}",
+              file = sys.stderr)
+    for worker in getattr(stats, "workers", {}).values():
+        print(
+            f"  worker {worker.pid}: {worker.rows} rows in {worker.chunks} chunks ({worker.rejected} rejected), "
+            f"{worker.busy_seconds:.3f}s busy - {worker.rows_per_second:,.0f} rows/sec",
+            file = sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
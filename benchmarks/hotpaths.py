@@ -0,0 +1,221 @@
+## Benchmark suite for the rate lookup and interest calculation hot paths.
+##
+##     python benchmarks/hotpaths.py                      # run and print results
+##     python benchmarks/hotpaths.py --save-baseline      # run and write benchmarks/baseline.json
+##     python benchmarks/hotpaths.py --compare            # run and compare against the baseline
+##
+## Each benchmark reports the best time per operation over several repeats. With --compare, any benchmark
+## slower than the baseline by more than --threshold (default 20%) is reported and the exit status is 1.
+## Inputs are generated from a fixed seed so runs are reproducible.
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main import App  # noqa: E402
+from batch import run_batch  # noqa: E402
+from series_registry import DEFAULT_SERIES_ID as SERIES_ID  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEED = 20111001
+
+# Span lengths in days, from 1 day to 40+ years
+SPANS = {"1d": 1, "30d": 30, "1y": 365, "5y": 5 * 365, "14y": 14 * 365, "40y": 40 * 365 + 10}
+# Judgment dates for each regime: static rate before 10/1/2011, rate changes after
+REGIME_STARTS = {"pre2011": date(1985, 3, 15), "post2011": date(2012, 2, 1)}
+
+
+## Calls fn `repeats` times and returns the best seconds per operation.
+## fn must perform `number` operations per call.
+def measure(fn, number: int, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best / number
+
+
+def bench_rate_lookup(app: App, repeats: int) -> dict:
+    rng = random.Random(SEED)
+    dates = [date(1981, 1, 1) + timedelta(days = rng.randint(0, 16500)) for _ in range(10_000)]
+    db = app.db
+
+    def single():
+        for d in dates:
+            db.get_rate_as_of(SERIES_ID, d)
+
+    def bulk_unsorted():
+        db.get_rates_as_of(SERIES_ID, dates)
+
+    ordered = sorted(dates)
+
+    def bulk_sorted():
+        db.get_rates_as_of(SERIES_ID, ordered)
+
+    return {
+        "rate_lookup.single": measure(single, len(dates), repeats),
+        "rate_lookup.bulk_unsorted": measure(bulk_unsorted, len(dates), repeats),
+        "rate_lookup.bulk_sorted": measure(bulk_sorted, len(dates), repeats),
+    }
+
+
+## Interest for one span per regime. "uncached" clears the factor cache before every call so the
+## engine itself is measured; "cached" repeats the same dates the way statement runs do.
+def bench_interest(app: App, repeats: int) -> dict:
+    results = {}
+    number = 200
+    for regime, start in REGIME_STARTS.items():
+        for label, days in SPANS.items():
+            end = start + timedelta(days = days - 1)
+
+            def uncached():
+                for _ in range(number):
+                    app.factor_cache.clear()
+                    app.calculate_interest(25_000.0, start, end, start)
+
+            def cached():
+                for _ in range(number):
+                    app.calculate_interest(25_000.0, start, end, start)
+
+            def exact():
+                for _ in range(number):
+                    app.calculate_interest_cents(2_500_000, start, end, start)
+
+            results[f"interest.{regime}.{label}.uncached"] = measure(uncached, number, repeats)
+            results[f"interest.{regime}.{label}.cached"] = measure(cached, number, repeats)
+            results[f"interest.{regime}.{label}.exact"] = measure(exact, number, repeats)
+
+        # The day-by-day reference loop, kept short so the suite stays quick
+        end = start + timedelta(days = SPANS["1y"] - 1)
+        results[f"interest.{regime}.1y.daily"] = measure(
+            lambda: [app.calculate_interest(25_000.0, start, end, start, method = "daily") for _ in range(20)],
+            20, repeats,
+        )
+    return results
+
+
+def bench_app_construction(repeats: int) -> dict:
+    number = 20
+    return {"app.construct": measure(lambda: [App() for _ in range(number)], number, repeats)}
+
+
+def _judgment_rows(count: int) -> list[tuple[float, date, date]]:
+    rng = random.Random(SEED + 1)
+    rows = []
+    for _ in range(count):
+        start = date(1990, 1, 1) + timedelta(days = rng.randint(0, 12500))
+        end = start + timedelta(days = rng.randint(1, 8000))
+        rows.append((round(rng.uniform(500, 500_000), 2), start, end))
+    return rows
+
+
+## Rows per second through the streaming CSV batch path, and through the vectorized path when NumPy is installed.
+## Reported as seconds per row so every entry in the baseline means "lower is better".
+def bench_batch(repeats: int) -> dict:
+    rows = _judgment_rows(20_000)
+    lines = ["principal,start_date,end_date"]
+    lines += [f"{p},{s.strftime('%m/%d/%Y')},{e.strftime('%m/%d/%Y')}" for p, s, e in rows]
+    text = "\n".join(lines) + "\n"
+
+    def streaming():
+        # Fresh App each run so the factor cache does not carry over between repeats
+        run_batch(App(), io.StringIO(text), io.StringIO(), io.StringIO(), "csv")
+
+    results = {"batch.csv_stream_per_row": measure(streaming, len(rows), repeats)}
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return results
+
+    app = App()
+    principals = [p for p, _, _ in rows]
+    starts = [s for _, s, _ in rows]
+    ends = [e for _, _, e in rows]
+    results["batch.vectorized_per_row"] = measure(
+        lambda: app.calculate_interest_many(principals, starts, ends), len(rows), repeats,
+    )
+    return results
+
+
+def run_all(repeats: int) -> dict:
+    app = App()
+    results = {}
+    results.update(bench_rate_lookup(app, repeats))
+    results.update(bench_interest(app, repeats))
+    results.update(bench_app_construction(repeats))
+    results.update(bench_batch(repeats))
+    return results
+
+
+## Returns (name, baseline, current, ratio) for every benchmark slower than baseline * (1 + threshold).
+def find_regressions(baseline: dict, current: dict, threshold: float) -> list[tuple[str, float, float, float]]:
+    regressions = []
+    for name, seconds in current.items():
+        before = baseline.get(name)
+        if before and seconds > before * (1 + threshold):
+            regressions.append((name, before, seconds, seconds / before))
+    return regressions
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = "Benchmark CaseFlow rate lookup and interest hot paths.")
+    parser.add_argument("--repeats", type = int, default = 5)
+    parser.add_argument("--baseline", default = DEFAULT_BASELINE, help = "Baseline JSON file.")
+    parser.add_argument("--save-baseline", action = "store_true", help = "Write the results as the new baseline.")
+    parser.add_argument("--compare", action = "store_true", help = "Compare against the baseline.")
+    parser.add_argument("--threshold", type = float, default = 0.20,
+                        help = "Allowed slowdown before a benchmark counts as a regression (default 0.20).")
+    parser.add_argument("--json", action = "store_true", help = "Print results as JSON instead of a table.")
+    args = parser.parse_args(argv)
+
+    # Checked before running anything, so a missing baseline does not cost a full benchmark run
+    if args.compare and not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.", file = sys.stderr)
+        return 2
+
+    results = run_all(args.repeats)
+
+    if args.json:
+        print(json.dumps(results, indent = 2, sort_keys = True))
+    else:
+        for name, seconds in results.items():
+            print(f"{name:<40} {seconds * 1e6:12.3f} us/op")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding = "utf-8") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent = 2, sort_keys = True)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.compare:
+        try:
+            with open(args.baseline, encoding = "utf-8") as f:
+                baseline = json.load(f)["results"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Cannot read baseline {args.baseline}: {e}", file = sys.stderr)
+            return 2
+        regressions = find_regressions(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for name, before, now, ratio in regressions:
+                print(f"  {name:<40} {before * 1e6:10.3f} -> {now * 1e6:10.3f} us/op ({ratio:.2f}x)")
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+## Startup-time budget check for the non-interactive subcommands.
+## Runs each command in a fresh interpreter several times and compares the median wall time to a budget.
+## Exits with status 1 when any command is over budget, so CI can run:
+##
+##     python benchmarks/startup.py --budget-ms 150
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+COMMANDS = {
+    "rate": ["rate", "01/01/2020"],
+    "interest": ["interest", "10000", "01/01/2015", "12/31/2025"],
+}
+
+
+def time_command(args: list[str], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, MAIN, *args], cwd = ROOT, check = True,
+                       stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description = "Check CaseFlow subcommand startup time against a budget.")
+    parser.add_argument("--budget-ms", type = float, default = float(os.environ.get("CASEFLOW_STARTUP_BUDGET_MS", 150)),
+                        help = "Median wall-time budget per command in milliseconds (default 150).")
+    parser.add_argument("--runs", type = int, default = 7)
+    args = parser.parse_args(argv)
+
+    # Warm-up run so the rate snapshot and bytecode caches exist, as they would on a deployed install
+    time_command(COMMANDS["rate"], 1)
+
+    failed = False
+    for name, command in COMMANDS.items():
+        timings = time_command(command, args.runs)
+        median = statistics.median(timings)
+        status = "ok" if median <= args.budget_ms else "OVER BUDGET"
+        failed = failed or median > args.budget_ms
+        print(f"{name:<10} median {median:7.1f} ms  min {min(timings):7.1f} ms  budget {args.budget_ms:.0f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+## Codec for the MM/DD/YYYY legal date format used for all date input and output.
+## parse_date() accepts exactly what datetime.strptime(text, "%m/%d/%Y") accepts (one- or two-digit month and
+## day, four-digit year, no surrounding whitespace) and raises the same ValueError messages, without going
+## through the generic strptime machinery. Parsed strings are memoized, so a column with repeated dates costs
+## one dictionary lookup per value. The bulk functions convert whole columns to and from day ordinals.
+import re
+from array import array
+from datetime import date
+from typing import Iterable
+
+DATE_FORMAT = "%m/%d/%Y"
+
+# The regular expression strptime builds for "%m/%d/%Y"
+_PATTERN = re.compile(
+    r"(?P<m>1[0-2]|0[1-9]|[1-9])/(?P<d>3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])/(?P<Y>\d\d\d\d)", re.IGNORECASE,
+)
+
+# Memoized parses and formats; cleared when they reach the limit so memory stays bounded
+CACHE_LIMIT = 100_000
+_parsed: dict[str, date] = {}
+_formatted: dict[int, str] = {}
+
+
+def _parse(text: str) -> date:
+    if not isinstance(text, str):
+        raise TypeError(f"strptime() argument 1 must be str, not {'None' if text is None else type(text).__name__}")
+    found = _PATTERN.match(text)
+    if found is None:
+        raise ValueError(f"time data {text!r} does not match format {DATE_FORMAT!r}")
+    if found.end() != len(text):
+        raise ValueError(f"unconverted data remains: {text[found.end():]}")
+    return date(int(found["Y"]), int(found["m"]), int(found["d"]))
+
+
+## Drop-in for datetime.strptime(text, "%m/%d/%Y").date().
+def parse_date(text: str) -> date:
+    parsed = _parsed.get(text)
+    if parsed is None:
+        parsed = _parse(text)
+        if len(_parsed) >= CACHE_LIMIT:
+            _parsed.clear()
+        _parsed[text] = parsed
+    return parsed
+
+
+## Same as d.strftime("%m/%d/%Y") (years before 1000 are zero-padded to four digits).
+def format_date(d: date) -> str:
+    ordinal = d.toordinal()
+    text = _formatted.get(ordinal)
+    if text is None:
+        text = f"{d.month:02d}/{d.day:02d}/{d.year:04d}"
+        if len(_formatted) >= CACHE_LIMIT:
+            _formatted.clear()
+        _formatted[ordinal] = text
+    return text
+
+
+## argparse `type=` for MM/DD/YYYY command-line arguments (surrounding whitespace is ignored), shared by the
+## main.py subcommands and the modules that build their own parsers.
+def parse_date_arg(value: str) -> date:
+    import argparse
+
+    try:
+        return parse_date(value.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}'. Please use MM/DD/YYYY.") from None
+
+
+## Parses a column of MM/DD/YYYY strings into an int32 array of day ordinals.
+## With errors="raise" the first bad value raises its ValueError; with errors="coerce" it becomes 0
+## (not a valid ordinal), so the caller can reject those rows afterwards.
+def parse_ordinals(values: Iterable[str], errors: str = "raise") -> array:
+    if errors not in ("raise", "coerce"):
+        raise ValueError(f"Unknown errors mode '{errors}'. Use 'raise' or 'coerce'.")
+
+    ordinals: dict[str, int] = {}
+    result = array("i")
+    append = result.append
+    for text in values:
+        ordinal = ordinals.get(text)
+        if ordinal is None:
+            try:
+                ordinal = parse_date(text).toordinal()
+            except (TypeError, ValueError):
+                if errors == "raise":
+                    raise
+                append(0)
+                continue
+            ordinals[text] = ordinal
+        append(ordinal)
+    return result
+
+
+def parse_dates(values: Iterable[str]) -> list[date]:
+    return [parse_date(text) for text in values]
+
+
+## Formats a column of day ordinals (or dates) as MM/DD/YYYY strings.
+def format_ordinals(ordinals: Iterable[int]) -> list[str]:
+    formatted: dict[int, str] = {}
+    result = []
+    for ordinal in ordinals:
+        text = formatted.get(ordinal)
+        if text is None:
+            text = formatted[ordinal] = format_date(date.fromordinal(ordinal))
+        result.append(text)
+    return result
+
+
+def format_dates(dates: Iterable[date]) -> list[str]:
+    return [format_date(d) for d in dates]
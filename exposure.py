@@ -0,0 +1,214 @@
+## Portfolio exposure over time: total accrued interest across a set of open judgments at many as-of dates,
+## e.g. every month-end for ten years.
+##
+## Interest on a case from its judgment date through day D is principal * (R(D + 1) - R(judgment date)), where
+## R(x) is the running sum of the series' daily rates for the days before x (static-rate cases instead take
+## principal * rate * days). Both are linear in the per-case terms, so the cases are sorted by judgment date,
+## the as-of dates are sorted, and one sweep adds each case to running sums the moment its judgment date is
+## reached. Each as-of date then costs one evaluation of R per series and group, so the whole matrix costs
+## about O(cases + dates + periods) (plus the sorts) instead of cases x dates calculations.
+##
+## Totals are rounded to cents once, at the end, so they can differ from adding up individually rounded case
+## amounts by up to half a cent per case.
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Hashable, Iterable, Optional
+
+from date_codec import format_date, parse_date_arg
+from portfolio import OpenJudgment
+
+# Ways to break the totals down: name -> group key of a case
+GROUPINGS = {
+    "judgment_year": lambda case: case.judgment_date.year,
+    "series": lambda case: case.series_id,
+}
+
+
+@dataclass(frozen = True, slots = True)
+class ExposurePoint:
+    as_of: date
+    cases: int                      # cases with a judgment date on or before as_of
+    principal: float
+    accrued_interest: float         # from each judgment date through as_of, inclusive
+    by_group: dict[Hashable, float] = field(default_factory = dict)
+
+
+## Running sums of daily rates for one series. before(x) is the sum of the daily rates of every day before
+## ordinal x, counting from the first effective date; later days than the last one keep its rate.
+class _RateSums:
+    def __init__(self, rate_series):
+        self.ordinals = list(rate_series.ordinals)
+        self.daily = list(rate_series.daily_rates)
+        self.prefix = [0.0]
+        for i in range(1, len(self.ordinals)):
+            self.prefix.append(self.prefix[-1] + self.daily[i - 1] * (self.ordinals[i] - self.ordinals[i - 1]))
+
+    def index_on(self, ordinal: int) -> int:
+        return bisect_right(self.ordinals, ordinal) - 1
+
+    def before(self, ordinal: int) -> float:
+        i = self.index_on(ordinal - 1)
+        if i < 0:
+            return 0.0
+        return self.prefix[i] + self.daily[i] * (ordinal - self.ordinals[i])
+
+
+## Running sums for the open cases of one series and group. Ordinals are taken relative to `base` to keep
+## the products small.
+class _Accumulator:
+    __slots__ = ("cases", "principal", "periods_principal", "periods_offset", "static_rate", "static_offset")
+
+    def __init__(self):
+        self.cases = 0
+        self.principal = 0.0
+        self.periods_principal = 0.0    # sum of principal, cases accruing per rate period
+        self.periods_offset = 0.0       # sum of principal * R(judgment date), same cases
+        self.static_rate = 0.0          # sum of principal * daily rate, static-rate cases
+        self.static_offset = 0.0        # sum of principal * daily rate * (judgment ordinal - base - 1)
+
+    def interest(self, rate_sum_after: float, as_of: int) -> float:
+        return (self.periods_principal * rate_sum_after - self.periods_offset
+                + self.static_rate * as_of - self.static_offset)
+
+
+## Total principal and accrued interest of `cases` (OpenJudgment, e.g. a Portfolio) at every date in as_of_dates.
+## by: None, "judgment_year" or "series" to also break the interest down by that key (ExposurePoint.by_group).
+## Returns one ExposurePoint per date, in the order given.
+def exposure_series(app, cases: Iterable[OpenJudgment], as_of_dates: Iterable[date],
+                    by: Optional[str] = None) -> list[ExposurePoint]:
+    if by is not None and by not in GROUPINGS:
+        raise ValueError(f"Unknown grouping '{by}'. Use {', '.join(repr(name) for name in GROUPINGS)}.")
+    group_of = GROUPINGS.get(by)
+    db, registry = app.rates
+
+    as_of_dates = list(as_of_dates)
+    cases = sorted(cases, key = lambda case: case.judgment_date)
+    if not as_of_dates:
+        return []
+    base = min(cases[0].judgment_date, min(as_of_dates)).toordinal() if cases else 0
+
+    sums: dict[str, _RateSums] = {}
+    accumulators: dict[tuple[str, Hashable], _Accumulator] = {}
+    points: list[Optional[ExposurePoint]] = [None] * len(as_of_dates)
+    next_case = 0
+
+    for k in sorted(range(len(as_of_dates)), key = as_of_dates.__getitem__):
+        as_of = as_of_dates[k]
+
+        # Open every case whose judgment date has been reached
+        while next_case < len(cases) and cases[next_case].judgment_date <= as_of:
+            case = cases[next_case]
+            next_case += 1
+            rate_sums = sums.get(case.series_id)
+            if rate_sums is None:
+                series = db.rate_series.get(case.series_id)
+                if not series:
+                    raise ValueError(f"Unknown rate series '{case.series_id}' (case {case.case_id})")
+                rate_sums = sums[case.series_id] = _RateSums(series)
+            key = (case.series_id, group_of(case) if group_of else None)
+            acc = accumulators.get(key)
+            if acc is None:
+                acc = accumulators[key] = _Accumulator()
+
+            acc.cases += 1
+            acc.principal += case.principal
+            judgment = case.judgment_date.toordinal()
+            i = rate_sums.index_on(judgment)
+            if i < 0:
+                continue                # no rate on the judgment date: nothing accrues, as in calculate_interest
+            if registry.get(case.series_id).uses_static_rate(case.judgment_date):
+                acc.static_rate += case.principal * rate_sums.daily[i]
+                acc.static_offset += case.principal * rate_sums.daily[i] * (judgment - base - 1)
+            else:
+                acc.periods_principal += case.principal
+                acc.periods_offset += case.principal * rate_sums.before(judgment)
+
+        ordinal = as_of.toordinal()
+        after = {series_id: rate_sums.before(ordinal + 1) for series_id, rate_sums in sums.items()}
+        by_group: dict[Hashable, float] = {}
+        open_cases = 0
+        principal = 0.0
+        for (series_id, group), acc in accumulators.items():
+            open_cases += acc.cases
+            principal += acc.principal
+            by_group[group] = by_group.get(group, 0.0) + acc.interest(after[series_id], ordinal - base)
+
+        total = sum(by_group.values(), 0.0)
+        points[k] = ExposurePoint(
+            as_of, open_cases, round(principal, 2), round(total, 2),
+            {group: round(value, 2) for group, value in sorted(by_group.items())} if group_of else {},
+        )
+    return points
+
+
+## Month-ends from the month of `first` through `last` (month-ends after `last` are left out). With months=3
+## or 12 only calendar quarter or year ends are included, starting with the one that contains `first`.
+def month_ends(first: date, last: date, months: int = 1) -> list[date]:
+    if months not in (1, 3, 12):
+        raise ValueError("months must be 1, 3 or 12")
+    dates = []
+    year, month = first.year, first.month + (-first.month) % months
+    while True:
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        end = date(next_year, next_month, 1) - timedelta(days = 1)
+        if end > last:
+            return dates
+        dates.append(end)
+        for _ in range(months):
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+## `python main.py exposure portfolio.csv --from 01/01/2016 [--to MM/DD/YYYY] [--every month|quarter|year]
+##                                        [--by judgment_year|series] [-f csv|jsonl]`
+## Cases come from a portfolio checkpoint file (see portfolio.py); checkpoints are not used or changed.
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+    import csv
+    import json
+
+    from portfolio import Portfolio
+
+    parser = argparse.ArgumentParser(prog = "exposure",
+                                     description = "Total accrued interest of a portfolio at a series of dates.")
+    parser.add_argument("checkpoint", help = "Portfolio checkpoint CSV (read only).")
+    parser.add_argument("--from", dest = "first", type = parse_date_arg, required = True,
+                        help = "MM/DD/YYYY. The first date is the end of the month (quarter, year) containing it.")
+    parser.add_argument("--to", dest = "last", type = parse_date_arg, default = None,
+                        help = "MM/DD/YYYY. Defaults to today.")
+    parser.add_argument("--every", choices = ("month", "quarter", "year"), default = "month")
+    parser.add_argument("--by", choices = tuple(GROUPINGS), default = None, help = "Break the interest down.")
+    parser.add_argument("-f", "--format", choices = ("csv", "jsonl"), default = "csv")
+    args = parser.parse_args(argv)
+
+    if app is None:
+        from main import App
+        app = App()
+
+    months = {"month": 1, "quarter": 3, "year": 12}[args.every]
+    try:
+        cases = Portfolio.load(app, args.checkpoint)
+        points = exposure_series(app, cases, month_ends(args.first, args.last or date.today(), months), args.by)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    out = sys.stdout
+    if args.format == "jsonl":
+        for point in points:
+            record = {"as_of": format_date(point.as_of), "cases": point.cases, "principal": point.principal,
+                      "accrued_interest": point.accrued_interest}
+            if args.by:
+                record[f"by_{args.by}"] = {str(group): value for group, value in point.by_group.items()}
+            out.write(json.dumps(record) + "\n")
+        return 0
+
+    groups = sorted({group for point in points for group in point.by_group}, key = str)
+    writer = csv.writer(out)
+    writer.writerow(["as_of", "cases", "principal", "accrued_interest"] + [str(group) for group in groups])
+    for point in points:
+        writer.writerow([format_date(point.as_of), point.cases, f"{point.principal:.2f}",
+                         f"{point.accrued_interest:.2f}"]
+                        + [f"{point.by_group.get(group, 0.0):.2f}" for group in groups])
+    return 0
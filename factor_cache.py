@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Hashable, Optional
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+
+## Bounded LRU cache of per-dollar interest factors.
+## Keys are tuples that start with the series_id, e.g. (series_id, start_date, end_date, judgment_date),
+## so every entry for a series can be dropped when that series changes.
+class FactorCache:
+    def __init__(self, maxsize: int = 4096):
+        if maxsize < 1:
+            raise ValueError("FactorCache maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[float]:
+        factor = self._entries.get(key)
+        if factor is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return factor
+
+    def put(self, key: Hashable, factor: float) -> None:
+        self._entries[key] = factor
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last = False)
+            self.stats.evictions += 1
+
+    ## Drops every cached factor for one series. Registered as a RateDatabase listener so add_rate triggers it.
+    def invalidate_series(self, series_id: str) -> None:
+        stale = [key for key in self._entries if key[0] == series_id]
+        for key in stale:
+            del self._entries[key]
+        self.stats.invalidations += len(stale)
+
+    ## Drops the cached factors for a series that a rate change from `changed` on can affect: intervals
+    ## ending on or after that date, or, for static-rate entries (which only use the judgment-date rate),
+    ## a judgment date on or after it. Keys must be (series_id, start_date, end_date, judgment_date or None).
+    def invalidate_from(self, series_id: str, changed: date) -> None:
+        stale = [
+            key for key in self._entries
+            if key[0] == series_id and (key[2] if key[3] is None else key[3]) >= changed
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.stats.invalidations += len(stale)
+
+    def clear(self) -> None:
+        self.stats.invalidations += len(self._entries)
+        self._entries.clear()
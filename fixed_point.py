@@ -0,0 +1,120 @@
+## Exact fixed-point interest engine.
+## Principals are integer cents and daily rates are integers in units of 1e-10 (the precision of the
+## published Florida daily rates), so all accumulation is integer arithmetic with no float drift.
+## The only rounding step is the final conversion to cents, which rounds half away from zero.
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, localcontext
+from weakref import WeakKeyDictionary
+
+# Daily rates are stored as integer multiples of 1e-10
+RATE_SCALE = 10 ** 10
+
+
+## Converts a published daily rate (e.g. 0.0001306011) to integer 1e-10 units.
+## Goes through the shortest repr of the float so 0.0001306011 becomes exactly 1306011.
+def to_rate_units(daily_rate_decimal: float) -> int:
+    scaled = Decimal(repr(daily_rate_decimal)).scaleb(10)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f"Daily rate {daily_rate_decimal} has more precision than 1e-10")
+    return int(scaled)
+
+
+## Converts a dollar amount (float, int, str or Decimal) to integer cents, rounding half up.
+## Raises ValueError for an amount that is not a number, or is NaN or infinite.
+def to_cents(amount) -> int:
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{amount}'") from None
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount '{amount}'. It must be a finite number.")
+    # The default context keeps 28 digits, too few to quantize amounts of about 1e26 and more
+    with localcontext() as context:
+        context.prec = max(context.prec, len(value.as_tuple().digits) + 3, value.adjusted() + 4)
+        return int((value * 100).quantize(Decimal(1), rounding = ROUND_HALF_UP))
+
+
+## Divides a scaled integer by RATE_SCALE, rounding half away from zero.
+def _round_scaled(value: int) -> int:
+    quotient, remainder = divmod(abs(value), RATE_SCALE)
+    if remainder * 2 >= RATE_SCALE:
+        quotient += 1
+    return quotient if value >= 0 else -quotient
+
+
+## Interest in cents for principal_cents over a number of daily rate units (rate units * days).
+def cents_for_units(principal_cents: int, units: int) -> int:
+    return _round_scaled(principal_cents * units)
+
+
+## Integer columns for one rate series, built from the columns of a rates.RateSeries.
+## prefix_units[i] is the sum of daily rate units for every day before effective_ordinals[i].
+class FixedPointSeries:
+    def __init__(self, rate_series):
+        self.row_count = len(rate_series)
+        self.effective_ordinals = rate_series.ordinals.tolist()
+        self.rate_units = [to_rate_units(rate) for rate in rate_series.daily_rates]
+
+        self.prefix_units = [0]
+        for i in range(1, self.row_count):
+            days = self.effective_ordinals[i] - self.effective_ordinals[i - 1]
+            self.prefix_units.append(self.prefix_units[-1] + self.rate_units[i - 1] * days)
+
+    ## Rate units in effect on a day ordinal, or None before the first rate.
+    def rate_units_on(self, ordinal: int):
+        i = bisect_right(self.effective_ordinals, ordinal) - 1
+        if i < 0:
+            return None
+        return self.rate_units[i]
+
+    ## Sum of daily rate units for every day before the ordinal (0 before the first rate).
+    def units_before(self, ordinal: int) -> int:
+        i = bisect_right(self.effective_ordinals, ordinal - 1) - 1
+        if i < 0:
+            return 0
+        return self.prefix_units[i] + self.rate_units[i] * (ordinal - self.effective_ordinals[i])
+
+
+_series_cache: "WeakKeyDictionary[object, dict[str, FixedPointSeries]]" = WeakKeyDictionary()
+
+
+## Returns the integer columns for a series, rebuilding them if rates were added since they were built.
+def get_series(db, series_id: str) -> FixedPointSeries:
+    rows = db.rate_series.get(series_id)
+    if not rows:
+        raise ValueError(f"No rates found for series {series_id}")
+
+    per_db = _series_cache.setdefault(db, {})
+    series = per_db.get(series_id)
+    if series is None or series.row_count != len(rows):
+        series = FixedPointSeries(rows)
+        per_db[series_id] = series
+    return series
+
+
+## Per-dollar interest for an interval in 1e-10 units, following the same rules as App.calculate_interest:
+## judgments starting before static_rate_cutoff use the judgment-date rate for the whole span,
+## later ones accrue the rate in effect on each day. Start/End days are inclusive.
+def interest_factor_units(db, series_id: str, start_date: date, end_date: date, judgment_date: date,
+                          static_rate_cutoff: date) -> int:
+    series = get_series(db, series_id)
+    start = start_date.toordinal()
+    end = end_date.toordinal()
+
+    if start_date < static_rate_cutoff:
+        rate_units = series.rate_units_on(judgment_date.toordinal())
+        if rate_units is None:
+            return 0
+        return rate_units * (end - start + 1)
+
+    if end < start or series.rate_units_on(start) is None:
+        return 0
+    return series.units_before(end + 1) - series.units_before(start)
+
+
+## Interest in integer cents for a principal in integer cents. One rounding step, half away from zero.
+def interest_cents(db, series_id: str, principal_cents: int, start_date: date, end_date: date,
+                   judgment_date: date, static_rate_cutoff: date) -> int:
+    factor_units = interest_factor_units(db, series_id, start_date, end_date, judgment_date, static_rate_cutoff)
+    return _round_scaled(principal_cents * factor_units)
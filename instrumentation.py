@@ -0,0 +1,227 @@
+## Optional hot-path instrumentation.
+## enable() wraps the hot paths (rate lookups, interest calculation, App construction and rate loading,
+## batch runs) with timing wrappers; disable() puts the original functions back. Nothing is wrapped until
+## enable() is called, so a process that never enables instrumentation pays no overhead at all.
+##
+## Metrics can be exported as JSON or Prometheus text exposition:
+##     CASEFLOW_METRICS=metrics.prom python main.py batch judgments.csv
+## writes the file when the process exits (a .json extension selects JSON).
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import deque
+from functools import wraps
+from typing import Optional
+
+# Latency samples kept per operation for percentiles; counts and totals cover every call
+SAMPLE_WINDOW = 10_000
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class OperationStats:
+    __slots__ = ("count", "total_seconds", "max_seconds", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.samples = deque(maxlen = SAMPLE_WINDOW)
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.samples.append(seconds)
+
+    ## Nearest-rank quantile over the retained samples.
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(max(math.ceil(q * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+class Metrics:
+    def __init__(self):
+        self.operations: dict[str, OperationStats] = {}
+        # cache name -> object with a .stats attribute (hits, misses, evictions, hit_rate), e.g. FactorCache
+        self.caches: dict[str, object] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats()
+        stats.record(seconds)
+
+    def watch_cache(self, name: str, cache) -> None:
+        self.caches[name] = cache
+
+    def reset(self) -> None:
+        self.operations.clear()
+        self.caches.clear()
+
+    def to_dict(self) -> dict:
+        operations = {}
+        for name, stats in sorted(self.operations.items()):
+            operations[name] = {
+                "count": stats.count,
+                "total_seconds": stats.total_seconds,
+                "mean_seconds": stats.total_seconds / stats.count if stats.count else 0.0,
+                "max_seconds": stats.max_seconds,
+                **{f"p{int(q * 100)}_seconds": stats.quantile(q) for q in QUANTILES},
+            }
+        caches = {}
+        for name, cache in sorted(self.caches.items()):
+            s = cache.stats
+            caches[name] = {"hits": s.hits, "misses": s.misses, "evictions": s.evictions, "hit_rate": s.hit_rate}
+        return {"operations": operations, "caches": caches}
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP caseflow_operation_seconds Latency of instrumented CaseFlow operations.",
+            "# TYPE caseflow_operation_seconds summary",
+        ]
+        for name, stats in sorted(self.operations.items()):
+            for q in QUANTILES:
+                lines.append(f'caseflow_operation_seconds{{op="{name}",quantile="{q}"}} {stats.quantile(q):.9g}')
+            lines.append(f'caseflow_operation_seconds_sum{{op="{name}"}} {stats.total_seconds:.9g}')
+            lines.append(f'caseflow_operation_seconds_count{{op="{name}"}} {stats.count}')
+
+        if self.caches:
+            lines += [
+                "# HELP caseflow_cache_requests_total Cache lookups by result.",
+                "# TYPE caseflow_cache_requests_total counter",
+            ]
+            for name, cache in sorted(self.caches.items()):
+                lines.append(f'caseflow_cache_requests_total{{cache="{name}",result="hit"}} {cache.stats.hits}')
+                lines.append(f'caseflow_cache_requests_total{{cache="{name}",result="miss"}} {cache.stats.misses}')
+            lines += [
+                "# HELP caseflow_cache_evictions_total Entries evicted to stay within the cache size.",
+                "# TYPE caseflow_cache_evictions_total counter",
+            ]
+            for name, cache in sorted(self.caches.items()):
+                lines.append(f'caseflow_cache_evictions_total{{cache="{name}"}} {cache.stats.evictions}')
+            lines += [
+                "# HELP caseflow_cache_hit_ratio Fraction of cache lookups that were hits.",
+                "# TYPE caseflow_cache_hit_ratio gauge",
+            ]
+            for name, cache in sorted(self.caches.items()):
+                lines.append(f'caseflow_cache_hit_ratio{{cache="{name}"}} {cache.stats.hit_rate:.6g}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+# (owner, attribute name, original function) for everything enable() wrapped
+_patched: list[tuple[object, str, object]] = []
+
+
+def is_enabled() -> bool:
+    return bool(_patched)
+
+
+def _timed(name: str, fn):
+    record = metrics.record
+    clock = time.perf_counter
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, clock() - started)
+    return wrapper
+
+
+def _wrap(owner, attribute: str, name: str) -> None:
+    original = owner.__dict__.get(attribute) if isinstance(owner, type) else getattr(owner, attribute, None)
+    if original is None:
+        return
+    setattr(owner, attribute, _timed(name, original))
+    _patched.append((owner, attribute, original))
+
+
+## Installs the timing wrappers. app_class is the App class in use (main.App); its module's
+## load_rate_database is wrapped too, so App construction time is split into rate loading and the rest.
+## Every App constructed afterwards has its factor cache registered for hit-rate reporting.
+def enable(app_class = None) -> None:
+    if is_enabled():
+        return
+
+    import rates
+
+    _wrap(rates.RateDatabase, "get_rate_as_of", "rate_db.get_rate_as_of")
+    _wrap(rates.RateDatabase, "get_rates_as_of", "rate_db.get_rates_as_of")
+    _wrap(rates.RateDatabase, "iter_periods", "rate_db.iter_periods")
+    _wrap(rates.RateDatabase, "iter_period_rates", "rate_db.iter_period_rates")
+
+    if app_class is not None:
+        _wrap(app_class, "calculate_interest", "app.calculate_interest")
+        _wrap(app_class, "calculate_interest_cents", "app.calculate_interest_cents")
+        _wrap(app_class, "calculate_interest_many", "app.calculate_interest_many")
+        _wrap(sys.modules[app_class.__module__], "load_rate_database", "app.load_rate_database")
+
+        original_init = app_class.__dict__["__init__"]
+
+        @wraps(original_init)
+        def init(self, *args, **kwargs):
+            original_init(self, *args, **kwargs)
+            metrics.watch_cache("factor", self.factor_cache)
+
+        app_class.__init__ = _timed("app.init", init)
+        _patched.append((app_class, "__init__", original_init))
+
+    import batch
+    import parallel
+
+    _wrap(batch, "run_batch", "batch.run_batch")
+    # The run as a whole; calls made inside the worker processes are not recorded here
+    _wrap(parallel, "run_batch_parallel", "batch.run_batch_parallel")
+
+
+## Restores the original functions. Recorded metrics are kept until metrics.reset().
+def disable() -> None:
+    while _patched:
+        owner, attribute, original = _patched.pop()
+        setattr(owner, attribute, original)
+
+
+## Writes the current metrics to a local file, as JSON if the path ends in .json, else Prometheus text.
+## The file is replaced atomically so a scraper never reads a partial write.
+def export(path: str, fmt: Optional[str] = None) -> None:
+    fmt = fmt or ("json" if path.lower().endswith(".json") else "prometheus")
+    if fmt == "json":
+        text = json.dumps(metrics.to_dict(), indent = 2) + "\n"
+    elif fmt == "prometheus":
+        text = metrics.to_prometheus()
+    else:
+        raise ValueError(f"Unknown metrics format '{fmt}'. Use 'json' or 'prometheus'.")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir = directory, prefix = ".metrics-", suffix = ".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding = "utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+## Enables instrumentation and exports on exit when CASEFLOW_METRICS names an output file.
+def enable_from_environment(app_class = None) -> bool:
+    path = os.environ.get("CASEFLOW_METRICS")
+    if not path:
+        return False
+
+    import atexit
+
+    enable(app_class)
+    atexit.register(export, path)
+    return True
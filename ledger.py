@@ -0,0 +1,220 @@
+## Per-case ledger of payments and credits against a judgment.
+## Each payment is applied Florida-style: first to interest accrued and unpaid, then to principal.
+## Interest is simple interest on the unpaid principal, accrued with the same rules as App.calculate_interest
+## (Start/End days inclusive, static rate for judgments before the series cutoff).
+##
+## The running balance after every entry is cached. Adding, removing or back-dating an entry only
+## invalidates the entries from that date on, and they are recomputed from the last good balance the next
+## time a balance is needed, so one edit on a long garnishment history does not replay the whole ledger.
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from itertools import count
+from typing import Iterator
+
+from series_registry import DEFAULT_SERIES_ID
+
+ENTRY_KINDS = ("payment", "credit")
+
+
+@dataclass(frozen = True)
+class LedgerEntry:
+    entry_id: int
+    entry_date: date
+    amount: float               # positive dollars received
+    kind: str = "payment"       # payment or credit
+    memo: str = ""
+
+
+## Balances right after an entry is applied (or as of a date, for balance_as_of).
+@dataclass(frozen = True)
+class LedgerBalance:
+    as_of: date
+    principal: float            # unpaid principal
+    accrued_interest: float     # interest accrued and not yet paid
+    interest_paid: float        # running totals
+    principal_paid: float
+    unapplied: float = 0.0      # amount received beyond everything owed
+
+    @property
+    def total_due(self) -> float:
+        return round(self.principal + self.accrued_interest, 2)
+
+
+class CaseLedger:
+    def __init__(self, app, principal: float, judgment_date: date, series_id: str = DEFAULT_SERIES_ID):
+        self.app = app
+        self.principal = round(float(principal), 2)
+        self.judgment_date = judgment_date
+        self.series_id = series_id
+
+        # Parallel lists kept in (entry_date, entry_id) order
+        self._entries: list[LedgerEntry] = []
+        self._keys: list[tuple[date, int]] = []
+        # Balance after each entry; only the first _valid entries are up to date
+        self._balances: list[LedgerBalance] = []
+        self._valid = 0
+        self._key_by_id: dict[int, tuple[date, int]] = {}
+        self._ids = count(1)
+        # Rates and rules the balances were computed with, and the number of rates in the series at the time
+        # (add_rate only appends); a reload or a new rate invalidates the balances from the change on
+        self._rates = app.rates
+        self._rate_count = self._series_rate_count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> list[LedgerEntry]:
+        return list(self._entries)
+
+    ## Records a payment or credit and returns its entry_id.
+    def add_entry(self, entry_date: date, amount: float, kind: str = "payment", memo: str = "") -> int:
+        entry = LedgerEntry(next(self._ids), entry_date, round(float(amount), 2), kind, memo)
+        self._validate(entry)
+        self._insert(entry)
+        return entry.entry_id
+
+    def remove_entry(self, entry_id: int) -> LedgerEntry:
+        i = self._index_of(entry_id)
+        entry = self._entries.pop(i)
+        del self._keys[i]
+        del self._key_by_id[entry_id]
+        self._invalidate_from(i)
+        return entry
+
+    ## Changes the date, amount, kind or memo of an entry (e.g. back-dating a payment).
+    def update_entry(self, entry_id: int, **changes) -> LedgerEntry:
+        old = self._entries[self._index_of(entry_id)]
+        new = replace(old, **changes)
+        if "amount" in changes:
+            new = replace(new, amount = round(float(new.amount), 2))
+        self._validate(new)
+        self.remove_entry(entry_id)
+        self._insert(new)
+        return new
+
+    ## Balance after every entry, in date order.
+    def iter_schedule(self) -> Iterator[tuple[LedgerEntry, LedgerBalance]]:
+        self._refresh()
+        yield from zip(self._entries, self._balances)
+
+    ## Principal, accrued interest and totals at the end of as_of, including payments made that day.
+    def balance_as_of(self, as_of: date) -> LedgerBalance:
+        if as_of < self.judgment_date:
+            raise ValueError(f"{as_of} is before the judgment date {self.judgment_date}")
+
+        self._refresh()
+        i = bisect_right(self._keys, (as_of, float("inf"))) - 1
+        if i < 0:
+            previous = self._opening_balance()
+        else:
+            previous = self._balances[i]
+        if previous.as_of == as_of and i >= 0:
+            return previous
+
+        interest = self._accrue(previous.principal, previous.as_of, as_of, first = i < 0)
+        return replace(previous, as_of = as_of, accrued_interest = round(previous.accrued_interest + interest, 2))
+
+    def payoff(self, as_of: date) -> float:
+        return self.balance_as_of(as_of).total_due
+
+    def _validate(self, entry: LedgerEntry) -> None:
+        if entry.kind not in ENTRY_KINDS:
+            raise ValueError(f"Unknown entry kind '{entry.kind}'. Use 'payment' or 'credit'.")
+        if entry.amount <= 0:
+            raise ValueError("Ledger entry amount must be positive")
+        if entry.entry_date < self.judgment_date:
+            raise ValueError(f"Entry date {entry.entry_date} is before the judgment date {self.judgment_date}")
+
+    def _insert(self, entry: LedgerEntry) -> None:
+        key = (entry.entry_date, entry.entry_id)
+        i = bisect_left(self._keys, key)
+        self._keys.insert(i, key)
+        self._entries.insert(i, entry)
+        self._key_by_id[entry.entry_id] = key
+        self._invalidate_from(i)
+
+    ## Everything from position i on has to be recomputed; balances before it stay cached.
+    def _invalidate_from(self, i: int) -> None:
+        del self._balances[i:]
+        self._valid = min(self._valid, i)
+
+    def _index_of(self, entry_id: int) -> int:
+        key = self._key_by_id.get(entry_id)
+        if key is None:
+            raise KeyError(f"No ledger entry {entry_id}")
+        return bisect_left(self._keys, key)
+
+    def _series_rate_count(self) -> int:
+        return len(self.app.db.rate_series.get(self.series_id, []))
+
+    ## App.reload_rates() swapped in new rates: keep the balances of entries dated before the first change.
+    def _rates_reloaded(self) -> None:
+        (old_db, old_registry), (new_db, new_registry) = self._rates, self.app.rates
+        self._rates = self.app.rates
+        self._rate_count = self._series_rate_count()
+
+        if new_registry.get(self.series_id) != old_registry.get(self.series_id):
+            self._invalidate_from(0)
+            return
+        changed = new_db.changed_since(old_db).get(self.series_id)
+        if changed is not None:
+            # Keys are (entry_date, entry_id), so (changed,) sorts before every entry on that date
+            self._invalidate_from(bisect_left(self._keys, (changed,)))
+
+    def _opening_balance(self) -> LedgerBalance:
+        return LedgerBalance(self.judgment_date, self.principal, 0.0, 0.0, 0.0)
+
+    ## Per-dollar interest for judgment_date..day inclusive (0 before the judgment date).
+    ## The static-rate rule is decided by the judgment date, so every segment of a ledger follows the same rule.
+    def _cumulative_factor(self, day: date) -> float:
+        if day < self.judgment_date:
+            return 0.0
+        return self.app.interest_factor(self.series_id, self.judgment_date, day, self.judgment_date)
+
+    ## Interest on principal for the days after `since` through `until` (both days, when first=True,
+    ## since the judgment date itself accrues).
+    def _accrue(self, principal: float, since: date, until: date, first: bool) -> float:
+        if principal <= 0 or until < since:
+            return 0.0
+        start = since - timedelta(days = 1) if first else since
+        factor = self._cumulative_factor(until) - self._cumulative_factor(start)
+        return round(principal * factor, 2)
+
+    ## Recomputes the invalid tail of the ledger from the last valid balance.
+    def _refresh(self) -> None:
+        if self.app.rates is not self._rates:
+            self._rates_reloaded()
+
+        rate_count = self._series_rate_count()
+        if rate_count != self._rate_count:
+            # A rate was added to the series; every balance may be affected
+            self._rate_count = rate_count
+            self._invalidate_from(0)
+
+        if self._valid == len(self._entries):
+            return
+
+        balance = self._balances[self._valid - 1] if self._valid else self._opening_balance()
+        for i in range(self._valid, len(self._entries)):
+            entry = self._entries[i]
+            first = i == 0
+            interest = balance.accrued_interest + self._accrue(balance.principal, balance.as_of, entry.entry_date, first)
+            principal = balance.principal
+
+            # Florida order: accrued interest first, then principal
+            to_interest = min(entry.amount, interest)
+            to_principal = min(entry.amount - to_interest, principal)
+            unapplied = entry.amount - to_interest - to_principal
+
+            balance = LedgerBalance(
+                as_of = entry.entry_date,
+                principal = round(principal - to_principal, 2),
+                accrued_interest = round(interest - to_interest, 2),
+                interest_paid = round(balance.interest_paid + to_interest, 2),
+                principal_paid = round(balance.principal_paid + to_principal, 2),
+                unapplied = round(balance.unapplied + unapplied, 2),
+            )
+            self._balances.append(balance)
+        self._valid = len(self._entries)
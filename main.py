@@ -1,602 +1,74 @@
-from dataclasses import dataclass
-from datetime import date, datetime, timedelta
-from bisect import bisect_right
+import os
+from datetime import date, timedelta
 from typing import Optional
 
-
-@dataclass(frozen = True)
-class RateRow:
-    effective_date: date        # compare/sort safely as date
-    annual_rate_percent: float  # e.g., 8.0 for 8%
-    daily_rate_decimal: float   # e.g., 0.08 / 365 for daily rate
-
-class RateDatabase:
-    def __init__(self):
-        # series_id -> sorted list of RateRow by effective_date
-        self.rate_series: dict[str, list[RateRow]] = {}
-
-    def add_rate(self, series_id: str, rate_row: RateRow) -> None:
-        series = self.rate_series.setdefault(series_id, [])
-
-        # Enforce ascending order and no duplicates
-        if series:
-            last = series[-1].effective_date
-            if rate_row.effective_date <= last:
-                raise ValueError(
-                    f"Rate effective date {rate_row.effective_date} "
-                    f"must be after last date {last} in series {series_id}"
-                )
-        
-        series.append(rate_row)
-
-    def get_rate_as_of(self, series_id: str, as_of: date | datetime) -> Optional[RateRow]:
-        series = self.rate_series.get(series_id)
-        if not series:
-            return None
-        
-        if isinstance(as_of, datetime):
-            as_of = as_of.date()
-
-        dates = [r.effective_date for r in series]
-        i = bisect_right(dates, as_of) - 1
-        if i < 0:
-            return None
-        return series[i]
+import fixed_point
+from date_codec import format_date, parse_date, parse_date_arg
+from factor_cache import FactorCache
+from rates import (RATE_TABLE_DIR, SERIES_REGISTRY_FILE, RateDatabase, RateRow, load_rate_database,
+                   rate_tables_version)
+from series_registry import DEFAULT_SERIES_ID, SeriesRegistry, load_series_registry
 
 
 class App:
-    def __init__(self):
-        self.db = RateDatabase()
-
-        # Florida Post-Judgment Interest Rates 
-        series_id = "FL_POST_JUDGMENT"
-
-        ### Rate Table Data 
-        ### Table entries are ordered in ascending effective date 
-        ### Each entry must have a later effective date than the prior entry 
-        ### If any entry year is changed quartely, 
-        ### the rate as of January 1st of the following year MUST be stored 
-
-        # 10/1/81-12/31/94	12%	.03333%	.0003333
-        self.db.add_rate(
-            series_id,
-            RateRow(
-            effective_date = date(1981, 10, 1),
-            annual_rate_percent = 12.0,
-            daily_rate_decimal = 0.0003333
-            )
-        )
-
-
-        # 1995	8%	.02192%	.0002192
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(1995, 1, 1),
-                annual_rate_percent = 8.0,
-                daily_rate_decimal = 0.0002192
-            )
-        )
-
-        # 1996	10%	.02740%	.0002740
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(1996, 1, 1),
-                annual_rate_percent = 10.0,
-                daily_rate_decimal = 0.0002740
-            )
-        )
-
-        # 2001	11%	.03014%	.0003014
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2001, 1, 1),
-                annual_rate_percent = 11.0,
-                daily_rate_decimal = 0.0003014
-            )
-        )
-
-        # 2002	9%	.02466%	.0002466
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2002, 1, 1),
-                annual_rate_percent = 9.0,
-                daily_rate_decimal = 0.0002466
-            )
-        )
-
-        # 2003	6%	.01644%	.0001644
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2003, 1, 1),
-                annual_rate_percent = 6.0,
-                daily_rate_decimal = 0.0001644
-            )
-        )
-
-        # 2004	7%	.01918%	.0001918
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2004, 1, 1),
-                annual_rate_percent = 7.0,
-                daily_rate_decimal = 0.0001918
-            )
-        )
-
-        # 2006	9%	.02466%	.0002466
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2006, 1, 1),
-                annual_rate_percent = 9.0,
-                daily_rate_decimal = 0.0002466
-            )
-        )
-
-        # 2007	11%	.03014%	.0003014
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2007, 1, 1),
-                annual_rate_percent = 11.0,
-                daily_rate_decimal = 0.0003014
-            )
-        )
-
-        # 2009	8%	.02192%	.0002192 
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2009, 1, 1),
-                annual_rate_percent = 8.0,
-                daily_rate_decimal = 0.0002192
-            )
-        )
-
-        # 2010	6%	.01644%	.0001644
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2010, 1, 1),
-                annual_rate_percent = 6.0,
-                daily_rate_decimal = 0.0001644
-            )
-        )
-
-        # 1/1/2011-9/30/11	6%	.01644%	.0001644
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2011, 1, 1),
-                annual_rate_percent = 6.0,
-                daily_rate_decimal = 0.0001644
-            )
-        )
-
-        # 10/1/11 - 12/31/2011	4.75%	.0130137%	.000130137
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2011, 10, 1),
-                annual_rate_percent = 4.75,
-                daily_rate_decimal = 0.000130137
-            )
-        )
-
-        # 2012	4.75%	.0129781%	.000129781 
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2012, 1, 1),
-                annual_rate_percent = 4.75,
-                daily_rate_decimal = 0.000129781
-            )
-        )
-
-        # January 1, 2013	4.75%	.0130137%	.000130137
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2013, 1, 1),
-                annual_rate_percent = 4.75,
-                daily_rate_decimal = 0.000130137
-            )
-        )
-
-        # January 1, 2016	4.75%	.0129781%	.000129781
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2016, 1, 1),
-                annual_rate_percent = 4.75,
-                daily_rate_decimal = 0.000129781
-            )
-        )
-
-        # April 1, 2016	4.78%	.01306011%	.0001306011
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2016, 4, 1),
-                annual_rate_percent = 4.78,
-                daily_rate_decimal = 0.0001306011
-            )
-        )
-
-        # July 1, 2016	4.84%	.01322404%	.0001322404
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2016, 7, 1),
-                annual_rate_percent = 4.84,
-                daily_rate_decimal = 0.0001322404
-            )
-        )
-
-        # October 1, 2016	4.91%	.01341530%	.0001341530
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2016, 10, 1),
-                annual_rate_percent = 4.91,
-                daily_rate_decimal = 0.0001341530
-            )
-        )
-
-        # January 1, 2017	4.97%	.01361644%	.0001361644
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2017, 1, 1),
-                annual_rate_percent = 4.97,
-                daily_rate_decimal = 0.0001361644
-            )
-        )
-
-        # April 1, 2017     5.05%    .01383562%	 .0001383562
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2017, 4, 1),
-                annual_rate_percent = 5.05,
-                daily_rate_decimal = 0.0001383562
-            )
-        )
-
-        # July 1, 2017	5.17%	.01416438%	.0001416438
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2017, 7, 1),
-                annual_rate_percent = 5.17,
-                daily_rate_decimal = 0.0001416438
-            )
-        )
-
-        # October 1, 2017	5.35%	.0146575%	.000146575
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2017, 10, 1),
-                annual_rate_percent = 5.35,
-                daily_rate_decimal = 0.000146575
-            )
-        )
-
-        # January 1, 2018	5.53%	.0151507%	.000151507
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2018, 1, 1),
-                annual_rate_percent = 5.53,
-                daily_rate_decimal = 0.000151507
-            )
-        )
-
-        # April 1, 2018	5.72%	.0156712%	.000156712
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2018, 4, 1),
-                annual_rate_percent = 5.72,
-                daily_rate_decimal = 0.000156712
-            )
-        )
-
-        # July 1, 2018	5.97%	.0163562%	.000163562
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2018, 7, 1),
-                annual_rate_percent = 5.97,
-                daily_rate_decimal = 0.000163562
-            )
-        )
-
-        # October 1, 2018	6.09%	.0166849%	.000166849
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2018, 10, 1),
-                annual_rate_percent = 6.09,
-                daily_rate_decimal = 0.000166849
-            )
-        )
-
-        # January 1, 2019	6.33%	.0173425%	.000173425
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2019, 1, 1),
-                annual_rate_percent = 6.33,
-                daily_rate_decimal = 0.000173425
-            )
-        )
-
-        # April 1, 2019 	6.57%	.0180000%	.000180000
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2019, 4, 1),
-                annual_rate_percent = 6.57,
-                daily_rate_decimal = 0.000180000
-            )
-        )
-
-        # July 1, 2019	6.77%	.0185479%	.000185479
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2019, 7, 1),
-                annual_rate_percent = 6.77,
-                daily_rate_decimal = 0.000185479
-            )
-        )
-
-        # October 1, 2019	6.89%	.0188767%	.000188767
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2019, 10, 1),
-                annual_rate_percent = 6.89,
-                daily_rate_decimal = 0.000188767
-            )
-        )
-
-        # January 1, 2020	6.83%	.0186612%	.000186612
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2020, 1, 1),
-                annual_rate_percent = 6.83,
-                daily_rate_decimal = 0.000186612
-            )
-        )
-
-        # April 1, 2020	6.66%	.0181967%	.000181967
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2020, 4, 1),
-                annual_rate_percent = 6.66,
-                daily_rate_decimal = 0.000181967
-            )
-        )
-
-        # July 1, 2020	6.03%	.0164754%	.000164754
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2020, 7, 1),
-                annual_rate_percent = 6.03,
-                daily_rate_decimal = 0.000164754
-            )
-        )
-
-        # October 1, 2020	5.37%	.0146721%	.000146721
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2020, 10, 1),
-                annual_rate_percent = 5.37,
-                daily_rate_decimal = 0.000146721
-            )
-        )
-
-        # January 1, 2021	4.81%	.0131781%	.000131781
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2021, 1, 1),
-                annual_rate_percent = 4.81,
-                daily_rate_decimal = 0.000131781
-            )
-        )
-
-        # April 1, 2021	4.31%	.0118082%	.000118082
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2021, 4, 1),
-                annual_rate_percent = 4.31,
-                daily_rate_decimal = 0.000118082
-            )
-        )
-
-        # July 1, 2021	4.25%	.0116438%	.000116438
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2021, 7, 1),
-                annual_rate_percent = 4.25,
-                daily_rate_decimal = 0.000116438
-            )
-        )
-
-        # January 1, 2022	4.25%	.0116438%	.000116438
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2022, 1, 1),
-                annual_rate_percent = 4.25,
-                daily_rate_decimal = 0.000116438
-            )
-        )
-
-        # July 1, 2022	4.34%	.0118904%	.000118904
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2022, 7, 1),
-                annual_rate_percent = 4.34,
-                daily_rate_decimal = 0.000118904
-            )
-        )
-
-        # October 1, 2022	4.75%	.0130137%	.000130137
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2022, 10, 1),
-                annual_rate_percent = 4.75,
-                daily_rate_decimal = 0.000130137
-            )
-        )
-
-        # January 1, 2023	5.52%	.0151233%	.000151233
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2023, 1, 1),
-                annual_rate_percent = 5.52,
-                daily_rate_decimal = 0.000151233
-            )
-        )
-
-        # April 1, 2023	6.58%	.0180274%	.000180274
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2023, 4, 1),
-                annual_rate_percent = 6.58,
-                daily_rate_decimal = 0.000180274
-            )
-        )
-
-        # July 1, 2023	7.69%	.0210685%	.000210685
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2023, 7, 1),
-                annual_rate_percent = 7.69,
-                daily_rate_decimal = 0.000210685
-            )
-        )
-
-        # October 1, 2023	8.54%	.0233973%	.000233973
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2023, 10, 1),
-                annual_rate_percent = 8.54,
-                daily_rate_decimal = 0.000233973
-            )
-        )
-
-        # January 1, 2024	9.09%	.0248361%	.000248361
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2024, 1, 1),
-                annual_rate_percent = 9.09,
-                daily_rate_decimal = 0.000248361
-            )
-        )
-
-        # April 1, 2024	9.34%	.0255191%	.000255191
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2024, 4, 1),
-                annual_rate_percent = 9.34,
-                daily_rate_decimal = 0.000255191
-            )
-        )
-
-        # July 1, 2024	9.46%	.0258470%	.000258470
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2024, 7, 1),
-                annual_rate_percent = 9.46,
-                daily_rate_decimal = 0.000258470
-            )
-        )
-
-        # October 1, 2024	9.50%	.0259563%	.000259563 
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2024, 10, 1),
-                annual_rate_percent = 9.50,
-                daily_rate_decimal = 0.000259563
-            )
-        )
-
-        # January 1, 2025	9.38%	.0256986%	.000256986
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2025, 1, 1),
-                annual_rate_percent = 9.38,
-                daily_rate_decimal = 0.000256986
-            )
-        )
-
-        # April 1, 2025	9.15%	.0250685%	.000250685
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2025, 4, 1),
-                annual_rate_percent = 9.15,
-                daily_rate_decimal = 0.000250685
-            )
-        )
-
-        # July 1, 2025	8.90%	.0243836%	.000243836
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2025, 7, 1),
-                annual_rate_percent = 8.90,
-                daily_rate_decimal = 0.000243836
-            )
-        )
-
-        # October 1, 2025	8.65%	.0236986%	.000236986
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2025, 10, 1),
-                annual_rate_percent = 8.65,
-                daily_rate_decimal = 0.000236986
-            )
-        )
-
-        # January 1, 2026	8.44%	.0231233%	.000231233
-        self.db.add_rate(
-            series_id,
-            RateRow(
-                effective_date = date(2026, 1, 1),
-                annual_rate_percent = 8.44,
-                daily_rate_decimal = 0.000231233
-            )
-        )
+    def __init__(self, db: Optional[RateDatabase] = None, registry: Optional[SeriesRegistry] = None):
+        # Florida Post-Judgment Interest Rates (and any other series) come from the rate_tables directory.
+        # New quarterly rates are added there, not here; reload_rates() picks them up without a restart.
+        self.rates_dir = RATE_TABLE_DIR
+        db = db if db is not None else load_rate_database()
+
+        # Per-series rules, e.g. the 10/1/2011 static-rate cutoff for FL_POST_JUDGMENT (rate_tables/series.json)
+        registry = registry if registry is not None else load_series_registry()
+
+        # The rates and rules in use, swapped together as one tuple by reload_rates(). Each calculation reads
+        # this once, so it sees a single consistent version even if a reload happens while it runs.
+        self._rates: tuple[RateDatabase, SeriesRegistry] = (db, registry)
+
+        # Per-dollar interest factors, dropped for a series whenever add_rate changes it
+        self.factor_cache = FactorCache(maxsize = 4096)
+        db.add_listener(self.factor_cache.invalidate_series)
+
+    ## (RateDatabase, SeriesRegistry) currently in use. Read it once to get a consistent version of both.
+    @property
+    def rates(self) -> tuple[RateDatabase, SeriesRegistry]:
+        return self._rates
+
+    @property
+    def db(self) -> RateDatabase:
+        return self._rates[0]
+
+    @property
+    def registry(self) -> SeriesRegistry:
+        return self._rates[1]
+
+    ## Loads the rate tables and series rules from `directory` (default: where they were loaded from) and
+    ## swaps them in atomically. Calculations already running finish on the version they started with.
+    ## Cached factors are dropped only where they reach the first changed effective date of a changed
+    ## series, so a new quarterly rate leaves every interval ending before it cached.
+    ## Returns {series_id: first changed date}; date.min means the series' rules changed.
+    def reload_rates(self, directory: Optional[str] = None) -> dict[str, date]:
+        directory = directory or self.rates_dir
+        old_db, old_registry = self._rates
+        new_db = load_rate_database(directory)
+        new_registry = load_series_registry(os.path.join(directory, SERIES_REGISTRY_FILE))
+
+        changes = new_db.changed_since(old_db)
+        for series_id in new_registry.rules.keys() | old_registry.rules.keys():
+            if new_registry.get(series_id) != old_registry.get(series_id):
+                changes[series_id] = date.min
+
+        new_db.add_listener(self.factor_cache.invalidate_series)
+        self.rates_dir = directory
+        self._rates = (new_db, new_registry)
+        for series_id, changed in changes.items():
+            self.factor_cache.invalidate_from(series_id, changed)
+        return changes
+
+    ## Cheap poll for long-running processes: reloads only when the files in the rates directory changed.
+    def reload_rates_if_changed(self) -> dict[str, date]:
+        if self.db.version is not None and rate_tables_version(self.rates_dir) == self.db.version:
+            return {}
+        return self.reload_rates()
 
     # Main menu
     def run(self):
@@ -634,20 +106,14 @@ class App:
         principal = float(input("Please enter the principal amount:"))
 
         # Prompt for start date
-        start_date = datetime.strptime(
-            input("Enter start date (MM/DD/YYYY): ").strip(),
-              "%m/%d/%Y"
-              ).date()
+        start_date = parse_date(input("Enter start date (MM/DD/YYYY): ").strip())
 
         ## For now, set start_date == judgment_date
         ## Might be unique in future, in case there's a discrepancy between the two
         judgment_date = start_date
 
         # Prompt for end date
-        end_date = datetime.strptime(
-            input("Please enter an end date (MM/DD/YYYY): ").strip(),
-                "%m/%d/%Y"
-        ).date()
+        end_date = parse_date(input("Please enter an end date (MM/DD/YYYY): ").strip())
 
         # Call to calculate_interest
         interest = self.calculate_interest(principal, start_date, end_date, judgment_date)
@@ -656,25 +122,114 @@ class App:
 
     ## Calculates interest from data passed in from compute_interest (principal amount, start date, end date and judgment date)
     # NOTE: judgment_date currently equals start_date in this version.
-    def calculate_interest(self, principal: float, start_date: date, end_date: date, judgment_date: date) -> float:
-        interest = 0.0
-        series_id = "FL_POST_JUDGMENT"
-        
-        ## If judgement date is prior to Oct 1st, 2011, then rate at that date is static throughout duration.
-        if start_date < date(2011, 10, 1): 
-            rate_row = self.db.get_rate_as_of(series_id, judgment_date)
+    ## method="periods" (default) accrues one rate period at a time, using the cached per-dollar factor.
+    ## method="daily" is the original day-by-day loop, kept as a reference to cross-check results.
+    ## method="exact" uses integer cents and integer daily rates (see fixed_point.py) with a single rounding step.
+    ## series_id picks the rate series and its rules from the registry (Florida post-judgment by default).
+    def calculate_interest(self, principal: float, start_date: date, end_date: date, judgment_date: date,
+                           method: str = "periods", series_id: str = DEFAULT_SERIES_ID) -> float:
+        if method not in ("periods", "daily", "exact"):
+            raise ValueError(f"Unknown interest method '{method}'. Use 'periods', 'daily' or 'exact'.")
+        db, registry = self._rates
+        self._check_series(db, series_id)
+
+        if method == "exact":
+            cents = fixed_point.interest_cents(db, series_id, fixed_point.to_cents(principal), start_date, end_date,
+                                               judgment_date, self._static_rate_cutoff(registry, series_id))
+            return cents / 100
+
+        if method == "daily" and not registry.get(series_id).uses_static_rate(start_date):
+            return self._accrue_daily(db, series_id, principal, start_date, end_date)
+
+        ## Interest is linear in principal, so only the per-dollar factor depends on the dates.
+        factor = self._interest_factor(db, registry, series_id, start_date, end_date, judgment_date)
+        return round(principal * factor, 2)
+
+    ## Exact fixed-point version of calculate_interest: principal and result are integer cents.
+    def calculate_interest_cents(self, principal_cents: int, start_date: date, end_date: date,
+                                 judgment_date: date, series_id: str = DEFAULT_SERIES_ID) -> int:
+        db, registry = self._rates
+        self._check_series(db, series_id)
+        return fixed_point.interest_cents(db, series_id, principal_cents, start_date, end_date, judgment_date,
+                                          static_rate_cutoff = self._static_rate_cutoff(registry, series_id))
+
+    @staticmethod
+    def _check_series(db: RateDatabase, series_id: str) -> None:
+        if series_id not in db.rate_series:
+            raise ValueError(f"Unknown rate series '{series_id}'")
+
+    ## Static-rate cutoff for the vectorized and fixed-point engines; date.min means the rule never applies.
+    @staticmethod
+    def _static_rate_cutoff(registry: SeriesRegistry, series_id: str) -> date:
+        return registry.get(series_id).static_rate_cutoff or date.min
+
+    ## Per-dollar interest for an interval, shared through the LRU factor cache by every case with the same dates.
+    def interest_factor(self, series_id: str, start_date: date, end_date: date, judgment_date: date) -> float:
+        db, registry = self._rates
+        return self._interest_factor(db, registry, series_id, start_date, end_date, judgment_date)
+
+    def _interest_factor(self, db: RateDatabase, registry: SeriesRegistry, series_id: str,
+                         start_date: date, end_date: date, judgment_date: date) -> float:
+        # judgment_date only matters under the static-rate rule, so leave it out of the key otherwise
+        static = registry.get(series_id).uses_static_rate(start_date)
+        key = (series_id, start_date, end_date, judgment_date if static else None)
+
+        factor = self.factor_cache.get(key)
+        if factor is None:
+            factor = self._compute_interest_factor(db, registry, series_id, start_date, end_date, judgment_date)
+            # A calculation still running on rates that reload_rates() has replaced must not refill the cache
+            if db is self._rates[0]:
+                self.factor_cache.put(key, factor)
+        return factor
+
+    @staticmethod
+    def _compute_interest_factor(db: RateDatabase, registry: SeriesRegistry, series_id: str,
+                                 start_date: date, end_date: date, judgment_date: date) -> float:
+        ## If judgement date is prior to the series' static-rate cutoff (Oct 1st, 2011 for Florida),
+        ## then rate at that date is static throughout duration.
+        if registry.get(series_id).uses_static_rate(start_date):
+            rate_row = db.get_rate_as_of(series_id, judgment_date)
             if rate_row is None:
                 return 0.0
 
             ## Start/End day inclusive for now
             days_inclusive = (end_date - start_date).days + 1
-            interest = principal * rate_row.daily_rate_decimal * days_inclusive
-            return round(interest, 2)
-        
-        ## Else, calculate interest daily and accumulate to overall interest amount.
+            return rate_row.daily_rate_decimal * days_inclusive
+
+        ## Else, accumulate the rate for each period overlapping the interval.
+        ## Same result as the daily loop, but the cost is one step per rate change instead of one per day.
+        if start_date <= end_date and db.get_rate_as_of(series_id, start_date) is None:
+            return 0.0
+
+        factor = 0.0
+        ## Start/End day inclusive for now
+        for days_inclusive, daily_rate_decimal in db.iter_period_rates(series_id, start_date, end_date):
+            factor += daily_rate_decimal * days_inclusive
+        return factor
+
+    ## Batch version of calculate_interest over arrays of principals and dates (NumPy required).
+    ## Dates may be date objects, numpy datetime64 values or day ordinals; judgment_dates default to start_dates.
+    ## Returns a NumPy array of interest amounts rounded to cents.
+    def calculate_interest_many(self, principals, start_dates, end_dates, judgment_dates = None,
+                                series_id: str = DEFAULT_SERIES_ID):
+        from vectorized import calculate_interest_vectorized
+
+        db, registry = self._rates
+        self._check_series(db, series_id)
+        if judgment_dates is None:
+            judgment_dates = start_dates
+        return calculate_interest_vectorized(
+            db, series_id, principals, start_dates, end_dates, judgment_dates,
+            static_rate_cutoff = self._static_rate_cutoff(registry, series_id),
+        )
+
+    ## Reference mode: calculate interest daily and accumulate to overall interest amount.
+    @staticmethod
+    def _accrue_daily(db: RateDatabase, series_id: str, principal: float, start_date: date, end_date: date) -> float:
+        interest = 0.0
         current_date = start_date
         while current_date <= end_date:
-            rate_row = self.db.get_rate_as_of(series_id, current_date)
+            rate_row = db.get_rate_as_of(series_id, current_date)
             if rate_row is None:
                 return 0.0
             
@@ -685,32 +240,30 @@ class App:
         return round(interest, 2)
 
     # Pulls rates from specific date, outputs as-of date, date rate went into effect, annual rate as percent, and daily rate as decimal.
-    def rate_lookup(self):
-        series_id = "FL_POST_JUDGMENT"
-
-
+    def rate_lookup(self, series_id: str = DEFAULT_SERIES_ID):
         while True:
             s = input("\nEnter date (MM/DD/YYYY) or 'b' to go back: ").strip()
             if s.lower() == "b":
                 return
 
             try:
-                as_of = datetime.strptime(s, "%m/%d/%Y").date() 
+                as_of = parse_date(s)
             except ValueError:
                 print("Invalid date format. Please use MM/DD/YYYY. Example: 10/01/2011")
                 continue
 
             rate = self.db.get_rate_as_of(series_id, as_of)
 
+            # Format for user display only
+            # This happens here for readability
+            # Future centralization of date formatting in a presentation-layer 'helper' when/if needed when app grows.
+            as_of_str = format_date(as_of)
+
             if rate is None:
                 print(f"No rate is found on or before {as_of_str}.")
                 continue
 
-            # Format for user display only
-            # This happens here for readability
-            # Future centralization of date formatting in a presentation-layer 'helper' when/if needed when app grows.
-            as_of_str = as_of.strftime("%m/%d/%Y")
-            effective_str = rate.effective_date.strftime("%m/%d/%Y")
+            effective_str = format_date(rate.effective_date)
 
             # Terminal formatting
             label_w = 20
@@ -726,9 +279,7 @@ class App:
 
     # NOTE: Internal sanity check for rate lookup boundaries. Not used in production flow.
     # Pulls rates from specific date, outputs effective date, annual rate as percent, annual rate as decimal, and daily rate as decimal.
-    def _test_rate_lookup(self):
-        series_id = "FL_POST_JUDGMENT"
-
+    def _test_rate_lookup(self, series_id: str = DEFAULT_SERIES_ID):
         test_dates = [
             date(1981, 9, 30),   # before first rate
             date(1981, 10, 1),   # first effective date
@@ -749,8 +300,27 @@ class App:
                 )
 
 
+    ## Compiles a template file and reports syntax errors and unknown fields (see templates.py).
     def validate_template(self):
-        print("Validating template... This feature will be added soon.")
+        import templates
+
+        path = input("Template file: ").strip()
+        columns = input("Extra input columns, comma separated (optional): ").strip()
+        try:
+            with open(path, encoding = "utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            print(f"Cannot read template: {e}")
+            return
+
+        problems = templates.validate_template(text, [c.strip() for c in columns.split(",") if c.strip()])
+        if problems:
+            print("Template has problems:")
+            for problem in problems:
+                print(f"  - {problem}")
+        else:
+            fields = ", ".join(sorted(templates.compile_template(text).fields)) or "none"
+            print(f"Template is valid. Fields used: {fields}")
         
     def print_banner(self):
         print("""
@@ -779,7 +349,149 @@ class App:
   ╲__╱╲___│_││_│_││_│_│_│ ╲___│_│   ╱_╱ ╲_(_)  ╲___╲__,_│_│ │_││_╲___│_│( ) │_│(_)_╱ ╲_(_)
                                                                         │╱                """)
         
-def main():
+## Non-interactive subcommands:
+## `python main.py interest|rate|batch|serve|accrue|exposure|whatif|report|schedule|solve|merge ...`
+## Each one does a single piece of work, prints JSON (or the batch output) and exits, without the banner or menu.
+## argparse and the batch module are only imported when a subcommand is used.
+def build_arg_parser():
+    import argparse
+
+    from batch import parse_principal_arg
+
+    parser = argparse.ArgumentParser(
+        prog = "caseflow",
+        description = "CaseFlow legal office utilities. Run without arguments for the interactive menu.",
+    )
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    interest = commands.add_parser("interest", help = "Calculate post-judgment interest and print it as JSON.")
+    interest.add_argument("principal", type = parse_principal_arg)
+    interest.add_argument("start_date", type = parse_date_arg, help = "MM/DD/YYYY")
+    interest.add_argument("end_date", type = parse_date_arg, help = "MM/DD/YYYY")
+    interest.add_argument("--judgment-date", type = parse_date_arg, default = None,
+                          help = "MM/DD/YYYY. Defaults to the start date.")
+    interest.add_argument("--method", choices = ("periods", "daily", "exact"), default = "periods")
+    interest.add_argument("--series", default = DEFAULT_SERIES_ID)
+
+    rate = commands.add_parser("rate", help = "Look up the rate in effect on a date and print it as JSON.")
+    rate.add_argument("as_of", type = parse_date_arg, help = "MM/DD/YYYY")
+    rate.add_argument("--series", default = DEFAULT_SERIES_ID)
+    rate.add_argument("--all", action = "store_true", help = "Show the rate of every series on the date.")
+
+    commands.add_parser("batch", add_help = False,
+                        help = "Compute interest for a CSV/JSONL file (see `batch --help`).")
+    commands.add_parser("serve", add_help = False,
+                        help = "Run the local HTTP/JSON service (see `serve --help`).")
+    commands.add_parser("accrue", add_help = False,
+                        help = "Advance a portfolio checkpoint file to a date (see `accrue --help`).")
+    commands.add_parser("report", add_help = False,
+                        help = "Write a CSV, JSONL or printable interest report (see `report --help`).")
+    commands.add_parser("schedule", add_help = False,
+                        help = "Itemize the interest for one judgment by rate period (see `schedule --help`).")
+    commands.add_parser("solve", add_help = False,
+                        help = "Payoff, per diem and target-interest dates for a file of cases (see `solve --help`).")
+    commands.add_parser("exposure", add_help = False,
+                        help = "Accrued interest of a portfolio at a series of dates (see `exposure --help`).")
+    commands.add_parser("whatif", add_help = False,
+                        help = "Interest for a file of cases under future rate scenarios (see `whatif --help`).")
+    commands.add_parser("merge", add_help = False,
+                        help = "Merge a document template with a file of cases (see `merge --help`).")
+    return parser
+
+
+def run_command(argv: list[str]) -> int:
+    import json
+
+    # batch, serve, accrue, exposure, whatif, report, schedule, solve and merge have their own parsers;
+    # everything after the subcommand is passed through
+    if argv[0] == "batch":
+        import batch
+        return batch.main(argv[1:], app = App())
+    if argv[0] == "serve":
+        import service
+        return service.main(argv[1:], app = App())
+    if argv[0] == "accrue":
+        import portfolio
+        return portfolio.main(argv[1:], app = App())
+    if argv[0] == "report":
+        import reports
+        return reports.main(argv[1:], app = App())
+    if argv[0] == "schedule":
+        import schedule
+        return schedule.main(argv[1:], app = App())
+    if argv[0] == "solve":
+        import solvers
+        return solvers.main(argv[1:], app = App())
+    if argv[0] == "exposure":
+        import exposure
+        return exposure.main(argv[1:], app = App())
+    if argv[0] == "whatif":
+        import scenarios
+        return scenarios.main(argv[1:], app = App())
+    if argv[0] == "merge":
+        import templates
+        return templates.main(argv[1:], app = App())
+
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == "rate":
+        # Only the rate tables are needed here, not a full App
+        db = load_rate_database()
+        as_of_str = format_date(args.as_of)
+        if args.all:
+            rates = db.get_rates_on(args.as_of)
+            print(json.dumps({
+                "as_of": as_of_str,
+                "rates": {series_id: _rate_json(rate) for series_id, rate in sorted(rates.items())},
+            }))
+            return 0 if rates else 1
+
+        rate = db.get_rate_as_of(args.series, args.as_of)
+        print(json.dumps({"series": args.series, "as_of": as_of_str, "rate": _rate_json(rate)}))
+        return 0 if rate is not None else 1
+
+    # interest
+    judgment_date = args.judgment_date or args.start_date
+    try:
+        interest = App().calculate_interest(args.principal, args.start_date, args.end_date, judgment_date,
+                                            method = args.method, series_id = args.series)
+    except ValueError as e:
+        import sys
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+    print(json.dumps({
+        "principal": args.principal,
+        "start_date": format_date(args.start_date),
+        "end_date": format_date(args.end_date),
+        "judgment_date": format_date(judgment_date),
+        "series": args.series,
+        "interest": interest,
+    }))
+    return 0
+
+
+def _rate_json(rate: Optional[RateRow]) -> Optional[dict]:
+    if rate is None:
+        return None
+    return {
+        "effective_date": format_date(rate.effective_date),
+        "annual_rate_percent": rate.annual_rate_percent,
+        "daily_rate_decimal": rate.daily_rate_decimal,
+    }
+
+
+def main(argv: Optional[list[str]] = None):
+    if argv is None:
+        import sys
+        argv = sys.argv[1:]
+
+    # Opt-in metrics export (see instrumentation.py); nothing is wrapped or imported otherwise
+    if os.environ.get("CASEFLOW_METRICS"):
+        import instrumentation
+        instrumentation.enable_from_environment(App)
+
+    if argv:
+        return run_command(argv)
 
     app = App()
 
@@ -787,11 +499,9 @@ def main():
     # app._test_rate_lookup()
 
     app.run()
-            
-            
+    return 0
+
 
-                
-            
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
 	
\ No newline at end of file
@@ -0,0 +1,196 @@
+## Multi-process batch runs: `python main.py batch judgments.csv --workers 0` uses one worker per CPU.
+## The parent publishes the rate tables once into a shared memory block in the compiled snapshot layout
+## (rate_snapshot.py). Each worker attaches to that block at start-up and reads the rate columns in place
+## (RateDatabase.add_series(copy = False)), so starting a worker costs no table loading, no parsing and no
+## copy of the rates, and all workers calculate with the same version of them.
+##
+## Input rows are read by the parent and sent to the workers in chunks. Each worker calculates a chunk and
+## formats its output and reject lines, and the parent writes the chunks back in input order, so the output
+## is byte-for-byte what run_batch() writes. At most two chunks per worker are in flight at a time, so memory
+## stays bounded whatever the size of the input.
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from multiprocessing import get_context, shared_memory
+from typing import Optional, TextIO
+
+import rate_snapshot
+from batch import (DEFAULT_CHUNK_SIZE, BatchStats, RowError, calculate_row, calculate_rows_cached, iter_chunks,
+                   read_rows, reject_line)
+from rates import RateDatabase
+
+
+@dataclass
+class WorkerStats:
+    pid: int
+    chunks: int = 0
+    rows: int = 0
+    rejected: int = 0
+    busy_seconds: float = 0.0       # time spent calculating and formatting, excluding waits for work
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.busy_seconds <= 0:
+            return 0.0
+        return self.rows / self.busy_seconds
+
+
+@dataclass
+class ParallelBatchStats(BatchStats):
+    workers: dict[int, WorkerStats] = field(default_factory = dict)
+
+
+## The rates of a RateDatabase in a named shared memory block, in the snapshot layout.
+## Use as a context manager: the block is removed when the owner is done with it.
+class SharedRateTables:
+    def __init__(self, db: RateDatabase):
+        data = rate_snapshot.encode_snapshot({
+            series_id: list(zip(series.ordinals, series.annual_rates, series.daily_rates))
+            for series_id, series in db.rate_series.items()
+        })
+        self.version = db.version
+        self._shm = shared_memory.SharedMemory(create = True, size = len(data))
+        self._shm.buf[:len(data)] = data
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self) -> None:
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> "SharedRateTables":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+## Opens a block published by SharedRateTables and returns it with a RateDatabase reading its columns in
+## place. Keep the SharedMemory object for as long as the database is used.
+def attach_rate_database(name: str, version: Optional[str] = None) -> tuple[shared_memory.SharedMemory, RateDatabase]:
+    shm = shared_memory.SharedMemory(name = name)
+    db = RateDatabase()
+    for series_id, (ordinals, annual, daily) in rate_snapshot.decode_snapshot(shm.buf).items():
+        db.add_series(series_id, ordinals, annual, daily, copy = False)
+    db.version = version
+    return shm, db
+
+
+# Per-worker state, set once by _init_worker
+_worker_shm: Optional[shared_memory.SharedMemory] = None
+_worker_app = None
+_worker_cache = None
+
+
+## cache: (path, max_age_days) of a ResultCache for the workers to share, or None
+def _init_worker(name: str, version: Optional[str], registry, cache: Optional[tuple[str, float]]) -> None:
+    global _worker_shm, _worker_app, _worker_cache
+    from main import App
+
+    _worker_shm, db = attach_rate_database(name, version)
+    _worker_app = App(db, registry)
+    if cache is not None:
+        from result_cache import ResultCache
+
+        _worker_cache = ResultCache(*cache)
+
+
+## Calculates one chunk of (line_number, row) pairs in a worker.
+## Returns (pid, output text, reject text, rows, rejected, cache hits, busy seconds).
+def _run_chunk(fmt: str, fieldnames: Optional[list[str]], chunk: list[tuple[int, object]]):
+    started = time.perf_counter()
+    out = io.StringIO()
+    rejects = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames = fieldnames, extrasaction = "ignore") if fmt == "csv" else None
+    rejected = 0
+    hits_before = _worker_cache.stats.hits if _worker_cache is not None else 0
+
+    for line_number, row, interest, error in _calculate_chunk(chunk):
+        if error is not None:
+            rejected += 1
+            rejects.write(reject_line(line_number, error, row))
+            continue
+
+        if writer is not None:
+            writer.writerow({**row, "interest": f"{interest:.2f}"})
+        else:
+            out.write(json.dumps({**row, "interest": interest}) + "\n")
+
+    hits = _worker_cache.stats.hits - hits_before if _worker_cache is not None else 0
+    return (os.getpid(), out.getvalue(), rejects.getvalue(), len(chunk), rejected, hits,
+            time.perf_counter() - started)
+
+
+def _calculate_chunk(chunk: list[tuple[int, object]]):
+    if _worker_cache is not None:
+        return calculate_rows_cached(_worker_app, _worker_cache, chunk)
+    results = []
+    for line_number, row in chunk:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            results.append((line_number, row, calculate_row(_worker_app, row), None))
+        except (RowError, ValueError, OverflowError) as e:
+            results.append((line_number, row, None, e))
+    return results
+
+
+## Same contract as batch.run_batch (same output, rejects and order), calculated by `workers` processes
+## (default: one per CPU). Rates are the version in use by `app` when the run starts.
+## With a ResultCache, every worker opens the same cache file and looks its chunks up there.
+def run_batch_parallel(app, in_stream: TextIO, out_stream: TextIO, reject_stream: TextIO, fmt: str = "csv",
+                       workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       cache = None) -> ParallelBatchStats:
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    workers = workers or os.cpu_count() or 1
+    db, registry = app.rates
+    stats = ParallelBatchStats()
+    started = time.perf_counter()
+    header = None
+    header_written = False
+
+    def collect(result) -> None:
+        nonlocal header_written
+        pid, output, rejects, rows, rejected, hits, busy_seconds = result
+        if output:
+            if header is not None and not header_written:
+                csv.writer(out_stream).writerow(header)
+                header_written = True
+            out_stream.write(output)
+        reject_stream.write(rejects)
+
+        worker = stats.workers.setdefault(pid, WorkerStats(pid))
+        worker.chunks += 1
+        worker.rows += rows
+        worker.rejected += rejected
+        worker.busy_seconds += busy_seconds
+        stats.rows += rows
+        stats.rejected += rejected
+        stats.cache_hits += hits
+
+    cache_args = None if cache is None else (cache.path, cache.max_age_seconds / 86400)
+    with SharedRateTables(db) as shared:
+        with get_context().Pool(workers, initializer = _init_worker,
+                                initargs = (shared.name, shared.version, registry, cache_args)) as pool:
+            pending = deque()
+            for chunk in iter_chunks(read_rows(in_stream, fmt), chunk_size):
+                # Same header as run_batch: the input columns, plus "interest"
+                if fmt == "csv" and header is None:
+                    header = list(chunk[0][1].keys())
+                    if "interest" not in header:
+                        header.append("interest")
+                pending.append(pool.apply_async(_run_chunk, (fmt, header, chunk)))
+                if len(pending) >= 2 * workers:
+                    collect(pending.popleft().get())
+            while pending:
+                collect(pending.popleft().get())
+
+    stats.elapsed_seconds = time.perf_counter() - started
+    return stats
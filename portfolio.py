@@ -0,0 +1,173 @@
+## Store of open judgments with incremental accrual.
+## Each case keeps a checkpoint: the last day interest has been accrued through and the per-dollar interest
+## factor accrued up to that day. advance_to() only adds the days since the checkpoint, so a nightly run costs
+## O(cases) instead of recalculating every case from its judgment date. Cases that share a checkpoint date
+## (normally the whole book) share one segment calculation.
+##
+## Checkpoints are saved to and loaded from a CSV file.
+import csv
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator, Optional
+
+from date_codec import format_date, parse_date, parse_date_arg
+from series_registry import DEFAULT_SERIES_ID
+
+CHECKPOINT_FIELDS = ("case_id", "principal", "judgment_date", "series_id", "accrued_to", "accrued_factor")
+
+
+@dataclass
+class OpenJudgment:
+    case_id: str
+    principal: float
+    judgment_date: date
+    series_id: str = DEFAULT_SERIES_ID
+    accrued_to: Optional[date] = None   # last day included in accrued_factor; None until first accrual
+    accrued_factor: float = 0.0         # per-dollar interest from judgment_date through accrued_to
+
+    @property
+    def accrued_interest(self) -> float:
+        return round(self.principal * self.accrued_factor, 2)
+
+
+class Portfolio:
+    def __init__(self, app):
+        self.app = app
+        self.cases: dict[str, OpenJudgment] = {}
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+    def __iter__(self) -> Iterator[OpenJudgment]:
+        return iter(self.cases.values())
+
+    def add_case(self, case_id: str, principal: float, judgment_date: date,
+                 series_id: str = DEFAULT_SERIES_ID) -> OpenJudgment:
+        if case_id in self.cases:
+            raise ValueError(f"Case {case_id} is already in the portfolio")
+        if series_id not in self.app.db.rate_series:
+            raise ValueError(f"Unknown rate series '{series_id}'")
+        case = OpenJudgment(case_id, float(principal), judgment_date, series_id)
+        self.cases[case_id] = case
+        return case
+
+    def remove_case(self, case_id: str) -> OpenJudgment:
+        return self.cases.pop(case_id)
+
+    ## Accrues every case through as_of (inclusive), starting from each case's checkpoint.
+    ## Cases already accrued through as_of or later are left alone. Returns the number of cases advanced.
+    def advance_to(self, as_of: date) -> int:
+        # (series_id, accrued_to, static judgment date or None) -> per-dollar factor for the new days
+        segment_factors: dict[tuple, float] = {}
+        advanced = 0
+
+        for case in self.cases.values():
+            last = case.accrued_to or case.judgment_date - timedelta(days = 1)
+            if last >= as_of:
+                continue
+
+            static = self.app.registry.get(case.series_id).uses_static_rate(case.judgment_date)
+            key = (case.series_id, last, case.judgment_date if static else None)
+            factor = segment_factors.get(key)
+            if factor is None:
+                factor = self._segment_factor(case.series_id, last + timedelta(days = 1), as_of,
+                                              case.judgment_date if static else None)
+                segment_factors[key] = factor
+
+            case.accrued_factor += factor
+            case.accrued_to = as_of
+            advanced += 1
+        return advanced
+
+    def total_accrued(self) -> float:
+        return round(sum(case.accrued_interest for case in self.cases.values()), 2)
+
+    ## Per-dollar interest for [start, end]. With a static judgment date, that date's rate applies to every day;
+    ## otherwise each rate period overlapping the interval contributes its own rate.
+    def _segment_factor(self, series_id: str, start: date, end: date, static_judgment_date: Optional[date]) -> float:
+        days = (end - start).days + 1
+        if static_judgment_date is not None:
+            rate_row = self.app.db.get_rate_as_of(series_id, static_judgment_date)
+            return 0.0 if rate_row is None else rate_row.daily_rate_decimal * days
+
+        factor = 0.0
+        for days, daily_rate_decimal in self.app.db.iter_period_rates(series_id, start, end):
+            factor += daily_rate_decimal * days
+        return factor
+
+    ## Writes every case and its checkpoint to a CSV file, replacing it atomically.
+    ## Factors are written with repr() so they round-trip exactly.
+    def save(self, path: str) -> None:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir = directory, prefix = ".portfolio-", suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "w", newline = "", encoding = "utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(CHECKPOINT_FIELDS)
+                for case in self.cases.values():
+                    writer.writerow((
+                        case.case_id,
+                        repr(case.principal),
+                        format_date(case.judgment_date),
+                        case.series_id,
+                        format_date(case.accrued_to) if case.accrued_to else "",
+                        repr(case.accrued_factor),
+                    ))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, app, path: str) -> "Portfolio":
+        portfolio = cls(app)
+        with open(path, newline = "", encoding = "utf-8") as f:
+            for number, row in enumerate(csv.DictReader(f), start = 2):
+                try:
+                    case = portfolio.add_case(
+                        row["case_id"],
+                        float(row["principal"]),
+                        parse_date(row["judgment_date"]),
+                        row["series_id"] or DEFAULT_SERIES_ID,
+                    )
+                    if row["accrued_to"]:
+                        case.accrued_to = parse_date(row["accrued_to"])
+                        case.accrued_factor = float(row["accrued_factor"])
+                except (KeyError, TypeError, ValueError) as e:
+                    raise ValueError(f"{path}: line {number}: {e}") from None
+        return portfolio
+
+
+## Nightly job: load the checkpoint file, accrue every case through --as-of (default today), save it back.
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(prog = "accrue", description = "Advance a portfolio checkpoint file.")
+    parser.add_argument("checkpoint", help = "Portfolio checkpoint CSV (updated in place).")
+    parser.add_argument("--as-of", type = parse_date_arg, default = None, help = "MM/DD/YYYY. Defaults to today.")
+    args = parser.parse_args(argv)
+    as_of = args.as_of or date.today()
+
+    if app is None:
+        from main import App
+        app = App()
+
+    try:
+        portfolio = Portfolio.load(app, args.checkpoint)
+        advanced = portfolio.advance_to(as_of)
+        portfolio.save(args.checkpoint)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+    print(json.dumps({
+        "as_of": format_date(as_of),
+        "cases": len(portfolio),
+        "advanced": advanced,
+        "total_accrued": portfolio.total_accrued(),
+    }))
+    return 0
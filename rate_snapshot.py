@@ -0,0 +1,145 @@
+## Compiled binary snapshots of the rate tables.
+## The CSV tables are validated once and written here as fixed-width columns, keyed by a hash of the CSV contents,
+## so later processes can memory-map them instead of parsing and validating the text again.
+##
+## Layout (little-endian):
+##   header:  magic b"CFRT", u16 format version, u16 series count
+##   series:  u16 name length, name (utf-8), padding to 8 bytes, u32 row count, u32 reserved,
+##            float64 annual_rate_percent[n], float64 daily_rate_decimal[n], int32 effective ordinal[n],
+##            padding to 8 bytes
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from typing import Iterable, Optional
+
+MAGIC = b"CFRT"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHH")
+_NAME_LEN = struct.Struct("<H")
+_COUNT = struct.Struct("<II")
+
+
+def _pad(offset: int, align: int = 8) -> int:
+    return (-offset) % align
+
+
+## Hash of the source tables (file names and bytes, in name order) plus the snapshot format version.
+def content_hash(paths: Iterable[str]) -> str:
+    digest = hashlib.sha256(f"caseflow-rates-v{FORMAT_VERSION}".encode())
+    for path in sorted(paths, key = os.path.basename):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        digest.update(b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def snapshot_path(cache_dir: str, digest: str) -> str:
+    return os.path.join(cache_dir, f"rates-{digest[:32]}.bin")
+
+
+## Serializes {series_id: [(ordinal, annual_rate_percent, daily_rate_decimal), ...]} into snapshot bytes.
+def encode_snapshot(series: dict[str, list[tuple[int, float, float]]]) -> bytes:
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(series))]
+    offset = _HEADER.size
+
+    for series_id, rows in series.items():
+        name = series_id.encode("utf-8")
+        block = _NAME_LEN.pack(len(name)) + name
+        offset += len(block)
+        padding = _pad(offset)
+        block += b"\0" * padding
+        offset += padding
+
+        n = len(rows)
+        columns = (
+            _COUNT.pack(n, 0)
+            + struct.pack(f"<{n}d", *(r[1] for r in rows))
+            + struct.pack(f"<{n}d", *(r[2] for r in rows))
+            + struct.pack(f"<{n}i", *(r[0] for r in rows))
+        )
+        offset += len(columns)
+        padding = _pad(offset)
+        columns += b"\0" * padding
+        offset += padding
+        parts.append(block + columns)
+
+    return b"".join(parts)
+
+
+## Reads a snapshot into {series_id: (ordinals, annual_rates, daily_rates)}.
+## The three columns are memoryviews over the buffer, so nothing is copied or parsed per row.
+def decode_snapshot(buffer) -> dict[str, tuple[memoryview, memoryview, memoryview]]:
+    # Columns are read in place with the host byte order, so big-endian hosts use the CSV tables instead
+    if sys.byteorder != "little":
+        raise ValueError("Rate snapshots can only be memory-mapped on little-endian hosts")
+
+    view = memoryview(buffer)
+    magic, version, series_count = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Not a CaseFlow rate snapshot, or written by a different version")
+
+    offset = _HEADER.size
+    series: dict[str, tuple[memoryview, memoryview, memoryview]] = {}
+    for _ in range(series_count):
+        (name_len,) = _NAME_LEN.unpack_from(view, offset)
+        offset += _NAME_LEN.size
+        series_id = bytes(view[offset:offset + name_len]).decode("utf-8")
+        offset += name_len
+        offset += _pad(offset)
+
+        n, _reserved = _COUNT.unpack_from(view, offset)
+        offset += _COUNT.size
+        annual = view[offset:offset + 8 * n].cast("d")
+        offset += 8 * n
+        daily = view[offset:offset + 8 * n].cast("d")
+        offset += 8 * n
+        ordinals = view[offset:offset + 4 * n].cast("i")
+        offset += 4 * n
+        offset += _pad(offset)
+
+        series[series_id] = (ordinals, annual, daily)
+    return series
+
+
+## Memory-maps a snapshot file. Returns None if it does not exist or cannot be read,
+## in which case the caller falls back to the CSV tables.
+def load_snapshot(path: str) -> Optional[dict[str, tuple[memoryview, memoryview, memoryview]]]:
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        return decode_snapshot(mapped)
+    except (ValueError, struct.error, TypeError):
+        return None
+
+
+## Writes a snapshot atomically (temp file + rename) so concurrent workers never see a half-written file.
+## Failing to write (read-only install, permissions) is not an error; the tables are simply parsed next time too.
+def write_snapshot(path: str, series: dict[str, list[tuple[int, float, float]]]) -> bool:
+    # Only needed when compiling, so it stays off the startup path of processes that load a snapshot
+    import tempfile
+
+    data = encode_snapshot(series)
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(dir = directory, prefix = ".rates-", suffix = ".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
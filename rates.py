@@ -0,0 +1,371 @@
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime
+from bisect import bisect_right
+from typing import Callable, Iterator, Optional
+import csv
+import os
+
+import rate_snapshot
+from date_codec import parse_date
+
+
+# Rate tables shipped with CaseFlow: one CSV per series, named <series_id>.csv
+RATE_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_tables")
+# Compiled snapshots of the tables, keyed by content hash (safe to delete)
+SNAPSHOT_DIR = os.path.join(RATE_TABLE_DIR, ".compiled")
+
+# Per-series rules that sit next to the tables (see series_registry.py)
+SERIES_REGISTRY_FILE = "series.json"
+
+RATE_TABLE_FIELDS = ("effective_date", "annual_rate_percent", "daily_rate_decimal")
+
+
+## One rate as seen by callers. Series store their rates in columns (RateSeries); a RateRow is a small
+## slotted value built from one position in those columns when a row is asked for.
+@dataclass(frozen = True, slots = True)
+class RateRow:
+    effective_date: date        # compare/sort safely as date
+    annual_rate_percent: float  # e.g., 8.0 for 8%
+    daily_rate_decimal: float   # e.g., 0.08 / 365 for daily rate
+
+
+## Columnar storage for one rate series, in ascending effective-date order:
+##   ordinals      effective dates as int32 day ordinals (date.toordinal())
+##   annual_rates  annual rate percent, float64
+##   daily_rates   daily rate decimal, float64
+## About 20 bytes per rate instead of a RateRow object, a date and two floats. Indexing and iteration give
+## RateRow views, built the first time a position is read and reused after that, so rates that are never
+## looked up individually never get one. bisect works on `ordinals` directly, and columns() hands out
+## read-only memoryviews for NumPy (np.frombuffer) and other bulk readers without copying. A column cannot
+## grow while a view of it is alive, so bulk readers should not hold on to the views.
+class RateSeries:
+    __slots__ = ("ordinals", "annual_rates", "daily_rates", "_rows")
+
+    def __init__(self):
+        self.ordinals = array("i")
+        self.annual_rates = array("d")
+        self.daily_rates = array("d")
+        # RateRow views built so far, by position (None until first read)
+        self._rows: list[Optional[RateRow]] = []
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def __getitem__(self, i: int) -> RateRow:
+        row = self._rows[i]
+        if row is None:
+            row = RateRow(date.fromordinal(self.ordinals[i]), self.annual_rates[i], self.daily_rates[i])
+            self._rows[i] = row
+        return row
+
+    def __iter__(self) -> Iterator[RateRow]:
+        for i in range(len(self.ordinals)):
+            yield self[i]
+
+    def append(self, rate_row: RateRow) -> None:
+        if not isinstance(self.ordinals, array):
+            raise ValueError("Cannot add rates to a series over shared columns")
+        self.ordinals.append(rate_row.effective_date.toordinal())
+        self.annual_rates.append(rate_row.annual_rate_percent)
+        self.daily_rates.append(rate_row.daily_rate_decimal)
+        self._rows.append(None)
+
+    ## Index of the rate in effect on a day ordinal, -1 before the first rate.
+    def index_on(self, ordinal: int) -> int:
+        return bisect_right(self.ordinals, ordinal) - 1
+
+    def columns(self) -> tuple[memoryview, memoryview, memoryview]:
+        return (memoryview(self.ordinals).toreadonly(), memoryview(self.annual_rates).toreadonly(),
+                memoryview(self.daily_rates).toreadonly())
+
+    ## Position of the first rate that differs from `other` (a date, annual or daily rate, or a rate only one
+    ## of the two has), or None if both hold the same rates.
+    def first_difference(self, other: "RateSeries") -> Optional[int]:
+        for i in range(min(len(self), len(other))):
+            if (self.ordinals[i] != other.ordinals[i] or self.annual_rates[i] != other.annual_rates[i]
+                    or self.daily_rates[i] != other.daily_rates[i]):
+                return i
+        if len(self) != len(other):
+            return min(len(self), len(other))
+        return None
+
+
+class RateDatabase:
+    def __init__(self):
+        # series_id -> RateSeries (columns sorted by effective date)
+        self.rate_series: dict[str, RateSeries] = {}
+        # Callbacks run with the series_id after add_rate changes that series (e.g. cache invalidation)
+        self._listeners: list[Callable[[str], None]] = []
+        # Cross-series timeline for get_rates_on: every change date across all series, and the rate of each
+        # series in effect from that date. Rebuilt lazily after add_rate.
+        self._timeline_dates: list[date] = []
+        self._timeline_rates: list[dict[str, RateRow]] = []
+        self._timeline_stale = True
+        # Content hash of the files this database was loaded from (see rate_tables_version); None if built by hand
+        self.version: Optional[str] = None
+
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        self._listeners.append(callback)
+
+    def add_rate(self, series_id: str, rate_row: RateRow) -> None:
+        series = self.rate_series.setdefault(series_id, RateSeries())
+
+        # Enforce ascending order and no duplicates
+        if series and rate_row.effective_date.toordinal() <= series.ordinals[-1]:
+            raise ValueError(
+                f"Rate effective date {rate_row.effective_date} "
+                f"must be after last date {date.fromordinal(series.ordinals[-1])} in series {series_id}"
+            )
+
+        series.append(rate_row)
+        self._timeline_stale = True
+
+        for callback in self._listeners:
+            callback(series_id)
+
+    ## Adds a whole new series from column buffers (int32 day ordinals, float64 annual rate percents and daily
+    ## rate decimals, e.g. arrays or memoryviews of a memory-mapped snapshot). They are copied in bulk, or with
+    ## copy=False used in place: the series then reads the caller's buffers (which must outlive the database)
+    ## and no rates can be added to it.
+    def add_series(self, series_id: str, ordinals, annual_rates, daily_rates, copy: bool = True) -> None:
+        if self.rate_series.get(series_id):
+            raise ValueError(f"Series {series_id} already has rates")
+        if not len(ordinals) == len(annual_rates) == len(daily_rates):
+            raise ValueError(f"Columns for series {series_id} have different lengths")
+
+        series = RateSeries()
+        if copy:
+            series.ordinals.frombytes(memoryview(ordinals).cast("B"))
+            series.annual_rates.frombytes(memoryview(annual_rates).cast("B"))
+            series.daily_rates.frombytes(memoryview(daily_rates).cast("B"))
+        else:
+            series.ordinals = memoryview(ordinals).toreadonly()
+            series.annual_rates = memoryview(annual_rates).toreadonly()
+            series.daily_rates = memoryview(daily_rates).toreadonly()
+        series._rows = [None] * len(series.ordinals)
+        if any(series.ordinals[i] >= series.ordinals[i + 1] for i in range(len(series) - 1)):
+            raise ValueError(f"Effective dates in series {series_id} must be strictly ascending")
+
+        self.rate_series[series_id] = series
+        self._timeline_stale = True
+        for callback in self._listeners:
+            callback(series_id)
+
+    def get_rate_as_of(self, series_id: str, as_of: date | datetime) -> Optional[RateRow]:
+        series = self.rate_series.get(series_id)
+        if series is None:
+            return None
+        
+        if isinstance(as_of, datetime):
+            as_of = as_of.date()
+
+        # Also covers an empty series
+        i = bisect_right(series.ordinals, as_of.toordinal()) - 1
+        if i < 0:
+            return None
+        return series._rows[i] or series[i]
+
+    ## Bulk version of get_rate_as_of. Results come back in the same order as the input dates.
+    ## Dates are resolved in one merge pass against the series (sorted first if the input is unsorted).
+    def get_rates_as_of(self, series_id: str, dates) -> list[Optional[RateRow]]:
+        as_of_ordinals = [(d.date() if isinstance(d, datetime) else d).toordinal() for d in dates]
+        results: list[Optional[RateRow]] = [None] * len(as_of_ordinals)
+
+        series = self.rate_series.get(series_id)
+        if not series or not as_of_ordinals:
+            return results
+
+        ordinals = series.ordinals
+        if all(as_of_ordinals[k] <= as_of_ordinals[k + 1] for k in range(len(as_of_ordinals) - 1)):
+            order = range(len(as_of_ordinals))
+        else:
+            order = sorted(range(len(as_of_ordinals)), key = as_of_ordinals.__getitem__)
+
+        # i = index of the rate in effect for the current date, -1 while before the first rate.
+        # Dates that fall in the same period share one RateRow.
+        i = -1
+        row = None
+        last = len(ordinals) - 1
+        for k in order:
+            as_of = as_of_ordinals[k]
+            if i < last and ordinals[i + 1] <= as_of:
+                while i < last and ordinals[i + 1] <= as_of:
+                    i += 1
+                row = series[i]
+            results[k] = row
+        return results
+
+    ## Rates in effect on a date for every series (or only the given series_ids), as {series_id: RateRow}.
+    ## Series with no rate on that date are left out. One bisect over the merged timeline, no scan of the series.
+    def get_rates_on(self, as_of: date | datetime, series_ids = None) -> dict[str, RateRow]:
+        if isinstance(as_of, datetime):
+            as_of = as_of.date()
+        if self._timeline_stale:
+            self._build_timeline()
+
+        i = bisect_right(self._timeline_dates, as_of) - 1
+        if i < 0:
+            return {}
+        rates = self._timeline_rates[i]
+        if series_ids is None:
+            return dict(rates)
+        return {series_id: rates[series_id] for series_id in series_ids if series_id in rates}
+
+    def _build_timeline(self) -> None:
+        change_ordinals = sorted({o for series in self.rate_series.values() for o in series.ordinals})
+        positions = {series_id: 0 for series_id in self.rate_series}
+        current: dict[str, RateRow] = {}
+        timeline_rates = []
+
+        for change_ordinal in change_ordinals:
+            current = dict(current)
+            for series_id, series in self.rate_series.items():
+                i = positions[series_id]
+                if i < len(series) and series.ordinals[i] == change_ordinal:
+                    current[series_id] = series[i]
+                    positions[series_id] = i + 1
+            timeline_rates.append(current)
+
+        self._timeline_dates = [date.fromordinal(o) for o in change_ordinals]
+        self._timeline_rates = timeline_rates
+        self._timeline_stale = False
+
+    ## Compares this database with an older version of it (e.g. before a reload).
+    ## Returns {series_id: earliest effective date that differs} for every series that changed; a series
+    ## present in only one of the two reports its first effective date. Interest for intervals ending before
+    ## that date is the same under both versions.
+    def changed_since(self, older: "RateDatabase") -> dict[str, date]:
+        changes: dict[str, date] = {}
+        for series_id in self.rate_series.keys() | older.rate_series.keys():
+            new_series = self.rate_series.get(series_id, RateSeries())
+            old_series = older.rate_series.get(series_id, RateSeries())
+            i = new_series.first_difference(old_series)
+            if i is not None:
+                changes[series_id] = date.fromordinal(
+                    min(series.ordinals[i] for series in (new_series, old_series) if i < len(series))
+                )
+        return changes
+
+    ## Walks the rate periods overlapping [start, end] (both inclusive).
+    ## Yields (period_start, period_end, rate_row) clipped to the interval, one per rate change.
+    ## Days before the first effective date in the series are not covered by any period.
+    def iter_periods(self, series_id: str, start: date, end: date):
+        series = self.rate_series.get(series_id)
+        if not series or end < start:
+            return
+
+        first, last = start.toordinal(), end.toordinal()
+        for i, period_start, period_end in self._period_bounds(series, first, last):
+            yield date.fromordinal(period_start), date.fromordinal(period_end), series[i]
+
+    ## Same walk as iter_periods, straight off the columns: yields (days_inclusive, daily_rate_decimal)
+    ## for each period, in date order, without building dates or RateRows.
+    def iter_period_rates(self, series_id: str, start: date, end: date):
+        series = self.rate_series.get(series_id)
+        if not series or end < start:
+            return
+
+        daily_rates = series.daily_rates
+        for i, period_start, period_end in self._period_bounds(series, start.toordinal(), end.toordinal()):
+            yield period_end - period_start + 1, daily_rates[i]
+
+    ## (index, first ordinal, last ordinal) of every period of the series overlapping [first, last].
+    @staticmethod
+    def _period_bounds(series: RateSeries, first: int, last: int):
+        ordinals = series.ordinals
+        count = len(ordinals)
+        i = max(bisect_right(ordinals, first) - 1, 0)
+        while i < count and ordinals[i] <= last:
+            period_start = max(ordinals[i], first)
+            period_end = min(ordinals[i + 1] - 1, last) if i + 1 < count else last
+            if period_start <= period_end:
+                yield i, period_start, period_end
+            i += 1
+
+
+## Raised when a rate table file fails validation. The message names the file and line.
+class RateTableError(ValueError):
+    pass
+
+
+## Reads and validates one rate table CSV. Lines starting with '#' are comments.
+## Columns: effective_date (MM/DD/YYYY), annual_rate_percent, daily_rate_decimal, plus optional notes
+## (e.g. the published table line). Effective dates must be strictly ascending.
+def read_rate_table(path: str) -> list[RateRow]:
+    rows: list[RateRow] = []
+    with open(path, newline = "", encoding = "utf-8") as f:
+        lines = (line for line in f if line.strip() and not line.lstrip().startswith("#"))
+        reader = csv.DictReader(lines)
+        missing = [name for name in RATE_TABLE_FIELDS if name not in (reader.fieldnames or [])]
+        if missing:
+            raise RateTableError(f"{path}: missing column(s) {', '.join(missing)}")
+
+        for number, record in enumerate(reader, start = 1):
+            where = f"{path}: row {number}"
+            try:
+                effective_date = parse_date(record["effective_date"].strip())
+                annual_rate_percent = float(record["annual_rate_percent"])
+                daily_rate_decimal = float(record["daily_rate_decimal"])
+            except (AttributeError, ValueError):
+                raise RateTableError(f"{where}: invalid value in {record}") from None
+
+            if not 0 <= annual_rate_percent < 100:
+                raise RateTableError(f"{where}: annual rate {annual_rate_percent}% is out of range")
+            if not 0 <= daily_rate_decimal < 0.01:
+                raise RateTableError(f"{where}: daily rate {daily_rate_decimal} is out of range")
+            if rows and effective_date <= rows[-1].effective_date:
+                raise RateTableError(
+                    f"{where}: effective date {effective_date} must be after {rows[-1].effective_date}"
+                )
+
+            rows.append(RateRow(effective_date, annual_rate_percent, daily_rate_decimal))
+    return rows
+
+
+def rate_table_paths(directory: str = RATE_TABLE_DIR) -> list[str]:
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(".csv")
+    )
+
+
+## Fingerprint of the rate tables and series rules in a directory. Changes whenever any of those files change,
+## so a long-running process can poll it cheaply and reload only when needed.
+def rate_tables_version(directory: str = RATE_TABLE_DIR) -> str:
+    paths = rate_table_paths(directory)
+    rules = os.path.join(directory, SERIES_REGISTRY_FILE)
+    if os.path.exists(rules):
+        paths.append(rules)
+    return rate_snapshot.content_hash(paths)
+
+
+## Builds a RateDatabase from every table in the directory.
+## The tables are parsed and validated once and compiled into a binary snapshot keyed by their content hash;
+## later processes memory-map that snapshot instead. Editing a CSV changes the hash, so a new snapshot is compiled.
+def load_rate_database(directory: str = RATE_TABLE_DIR, snapshot_dir: Optional[str] = SNAPSHOT_DIR) -> RateDatabase:
+    paths = rate_table_paths(directory)
+    db = RateDatabase()
+    db.version = rate_tables_version(directory)
+
+    snapshot_file = None
+    if snapshot_dir is not None:
+        snapshot_file = rate_snapshot.snapshot_path(snapshot_dir, db.version)
+        compiled = rate_snapshot.load_snapshot(snapshot_file)
+        if compiled is not None:
+            for series_id, (ordinals, annual, daily) in compiled.items():
+                db.add_series(series_id, ordinals, annual, daily)
+            return db
+
+    tables: dict[str, list[RateRow]] = {}
+    for path in paths:
+        series_id = os.path.splitext(os.path.basename(path))[0]
+        tables[series_id] = read_rate_table(path)
+        for rate_row in tables[series_id]:
+            db.add_rate(series_id, rate_row)
+
+    if snapshot_file is not None:
+        rate_snapshot.write_snapshot(snapshot_file, {
+            series_id: [(r.effective_date.toordinal(), r.annual_rate_percent, r.daily_rate_decimal) for r in rows]
+            for series_id, rows in tables.items()
+        })
+    return db
@@ -0,0 +1,193 @@
+## Streaming interest reports.
+## Judgments are read, calculated and written one at a time: iter_report_lines() is a generator over the
+## input rows and each writer consumes it line by line, so a statement run of any size uses the same memory
+## as a single row. Output formats:
+##   csv    one row per judgment with its inputs and the interest
+##   jsonl  one JSON object per line, same fields
+##   text   fixed-width columns for printing, with a totals line at the end
+import csv
+import json
+import sys
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Iterator, Optional, TextIO
+
+from batch import RowError, close_streams, detect_format, open_stream, parse_row, read_rows, reject_line
+from date_codec import format_date
+from series_registry import DEFAULT_SERIES_ID
+
+REPORT_FORMATS = ("csv", "jsonl", "text")
+REPORT_FIELDS = ("case_id", "principal", "start_date", "end_date", "judgment_date", "series", "days", "interest",
+                 "total_due")
+
+
+@dataclass(frozen = True, slots = True)
+class ReportLine:
+    case_id: str                # from an optional case_id column, else the input line number
+    principal: float
+    start_date: date
+    end_date: date
+    judgment_date: date
+    series_id: str
+    interest: float
+
+    @property
+    def days(self) -> int:
+        ## Start/End day inclusive, as in calculate_interest
+        return (self.end_date - self.start_date).days + 1
+
+    @property
+    def total_due(self) -> float:
+        return round(self.principal + self.interest, 2)
+
+
+@dataclass
+class ReportTotals:
+    lines: int = 0
+    principal: float = 0.0
+    interest: float = 0.0
+
+    def add(self, line: ReportLine) -> None:
+        self.lines += 1
+        self.principal += line.principal
+        self.interest += line.interest
+
+
+## Calculates each input row as it is read and yields a ReportLine for it.
+## Bad rows are passed to on_reject(line_number, error, row) (if given) and skipped.
+def iter_report_lines(app, rows: Iterable[tuple[int, object]], on_reject = None) -> Iterator[ReportLine]:
+    for line_number, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            principal, start_date, end_date, judgment_date = parse_row(row)
+            series_id = str(row.get("series") or "").strip() or DEFAULT_SERIES_ID
+            interest = app.calculate_interest(principal, start_date, end_date, judgment_date, series_id = series_id)
+        except (RowError, ValueError, OverflowError) as e:
+            if on_reject is not None:
+                on_reject(line_number, e, None if isinstance(row, RowError) else row)
+            continue
+        case_id = str(row.get("case_id") or "").strip() or str(line_number)
+        yield ReportLine(case_id, principal, start_date, end_date, judgment_date, series_id, interest)
+
+
+def write_csv(lines: Iterable[ReportLine], stream: TextIO, totals: ReportTotals) -> None:
+    writer = csv.writer(stream)
+    writer.writerow(REPORT_FIELDS)
+    for line in lines:
+        totals.add(line)
+        writer.writerow((
+            line.case_id, f"{line.principal:.2f}", format_date(line.start_date), format_date(line.end_date),
+            format_date(line.judgment_date), line.series_id, line.days, f"{line.interest:.2f}", f"{line.total_due:.2f}",
+        ))
+
+
+def write_jsonl(lines: Iterable[ReportLine], stream: TextIO, totals: ReportTotals) -> None:
+    dumps = json.dumps
+    for line in lines:
+        totals.add(line)
+        stream.write(dumps({
+            "case_id": line.case_id,
+            "principal": line.principal,
+            "start_date": format_date(line.start_date),
+            "end_date": format_date(line.end_date),
+            "judgment_date": format_date(line.judgment_date),
+            "series": line.series_id,
+            "days": line.days,
+            "interest": line.interest,
+            "total_due": line.total_due,
+        }) + "\n")
+
+
+# Fixed-width layout for the text format: (heading, width)
+_TEXT_COLUMNS = (("Case", 14), ("Principal", 15), ("Start", 10), ("End", 10), ("Judgment", 10),
+                 ("Days", 6), ("Interest", 14), ("Total due", 15))
+
+
+## Printable statement: a header, one fixed-width line per judgment and a totals line.
+## Only the running totals are kept, so the totals line costs nothing extra.
+def write_text(lines: Iterable[ReportLine], stream: TextIO, totals: ReportTotals, title: str = "") -> None:
+    if title:
+        stream.write(title + "\n\n")
+    heading = " ".join(f"{name:<{width}}" if i < 1 else f"{name:>{width}}"
+                       for i, (name, width) in enumerate(_TEXT_COLUMNS))
+    stream.write(heading + "\n" + "-" * len(heading) + "\n")
+
+    for line in lines:
+        totals.add(line)
+        stream.write(
+            f"{line.case_id[:14]:<14} {line.principal:>15,.2f} {format_date(line.start_date):>10} "
+            f"{format_date(line.end_date):>10} {format_date(line.judgment_date):>10} {line.days:>6} "
+            f"{line.interest:>14,.2f} {line.principal + line.interest:>15,.2f}\n"
+        )
+
+    stream.write("-" * len(heading) + "\n")
+    stream.write(
+        f"{'TOTAL':<14} {totals.principal:>15,.2f} {'':>10} {'':>10} {'':>10} {totals.lines:>6} "
+        f"{totals.interest:>14,.2f} {totals.principal + totals.interest:>15,.2f}\n"
+    )
+
+
+## Streams lines to the stream in the given format and returns the totals.
+def write_report(lines: Iterable[ReportLine], stream: TextIO, fmt: str = "csv", title: str = "") -> ReportTotals:
+    totals = ReportTotals()
+    if fmt == "csv":
+        write_csv(lines, stream, totals)
+    elif fmt == "jsonl":
+        write_jsonl(lines, stream, totals)
+    elif fmt == "text":
+        write_text(lines, stream, totals, title)
+    else:
+        raise ValueError(f"Unknown report format '{fmt}'. Use 'csv', 'jsonl' or 'text'.")
+    totals.principal = round(totals.principal, 2)
+    totals.interest = round(totals.interest, 2)
+    return totals
+
+
+## `python main.py report judgments.csv -f text -o statement.txt`
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog = "report",
+                                     description = "Write an interest report for a file of judgments.")
+    parser.add_argument("input", nargs = "?", default = "-",
+                        help = "Input file (.csv or .jsonl), same columns as batch. Use '-' or omit for stdin.")
+    parser.add_argument("-o", "--output", default = "-", help = "Report file. Defaults to stdout.")
+    parser.add_argument("-f", "--format", choices = REPORT_FORMATS, default = None,
+                        help = "Report format. Detected from the output extension (.csv, .jsonl, .txt) if omitted.")
+    parser.add_argument("--input-format", choices = ("csv", "jsonl"), default = None,
+                        help = "Input format. Detected from the file extension if omitted.")
+    parser.add_argument("-r", "--rejects", default = None, help = "Reject file (JSON lines). Defaults to stderr.")
+    parser.add_argument("--title", default = "", help = "Title line for the text format.")
+    args = parser.parse_args(argv)
+
+    in_fmt = detect_format(None if args.input == "-" else args.input, args.input_format)
+    fmt = args.format
+    if fmt is None:
+        output = args.output.lower()
+        fmt = "jsonl" if output.endswith((".jsonl", ".ndjson")) else "text" if output.endswith(".txt") else "csv"
+
+    if app is None:
+        from main import App
+        app = App()
+
+    in_stream = open_stream(args.input, "r", sys.stdin)
+    out_stream = open_stream(args.output, "w", sys.stdout)
+    reject_stream = open_stream(args.rejects, "w", sys.stderr)
+
+    rejected = 0
+
+    def reject(line_number: int, error: Exception, row) -> None:
+        nonlocal rejected
+        rejected += 1
+        reject_stream.write(reject_line(line_number, error, row))
+
+    try:
+        lines = iter_report_lines(app, read_rows(in_stream, in_fmt), reject)
+        totals = write_report(lines, out_stream, fmt, args.title)
+    finally:
+        close_streams(in_stream, out_stream, reject_stream)
+
+    print(f"Reported {totals.lines} judgments ({rejected} rejected), total interest {totals.interest:,.2f}",
+          file = sys.stderr)
+    return 0
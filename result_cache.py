@@ -0,0 +1,206 @@
+## Persistent interest results in a local SQLite file, shared across runs and processes.
+## Each entry is keyed by the case (series, principal, start, end and judgment dates) and by a fingerprint of
+## the rates it was calculated with: a hash of the RateDatabase columns and the series rules. A rate table
+## change gives a new fingerprint, so old entries are never returned again; they expire after max_age_days
+## like any other entry, and prune() deletes expired entries.
+##
+## Lookups and stores work on whole chunks of cases (get_many/put_many), one SQL statement per chunk, so a
+## batch run pays a few milliseconds per thousand rows for the cache instead of a round trip per row.
+## `python main.py batch judgments.csv --cache results.db` uses it for batch runs, and calculate_interest_cached()
+## for lists of cases from Python.
+import hashlib
+import math
+import sqlite3
+import time
+from datetime import date
+from typing import Iterable, Optional
+from weakref import WeakKeyDictionary
+
+from factor_cache import CacheStats
+
+DEFAULT_MAX_AGE_DAYS = 30.0
+
+# (series_id, principal, start_date, end_date, judgment_date)
+CaseKey = tuple[str, float, date, date, date]
+
+# Each rates fingerprint is stored once and entries refer to it by id, which keeps the keys short.
+# AUTOINCREMENT: an id is never handed out again after its version is deleted, so a process still holding it
+# cannot file results under a different fingerprint.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_versions (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT    NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS interest (
+    rates     INTEGER NOT NULL,
+    series    TEXT    NOT NULL,
+    principal REAL    NOT NULL,
+    start     INTEGER NOT NULL,
+    "end"     INTEGER NOT NULL,
+    judgment  INTEGER NOT NULL,
+    interest  REAL    NOT NULL,
+    created   REAL    NOT NULL,
+    PRIMARY KEY (rates, series, principal, start, "end", judgment)
+) WITHOUT ROWID
+"""
+
+# Column hash per RateDatabase, recomputed when rates are added to it: db -> (row count, hash)
+_column_hashes: "WeakKeyDictionary[object, tuple[int, str]]" = WeakKeyDictionary()
+
+
+def _column_hash(db) -> str:
+    row_count = sum(len(series) for series in db.rate_series.values())
+    cached = _column_hashes.get(db)
+    if cached is not None and cached[0] == row_count:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    for series_id in sorted(db.rate_series):
+        digest.update(series_id.encode("utf-8") + b"\0")
+        for column in db.rate_series[series_id].columns():
+            digest.update(column.cast("B"))
+    _column_hashes[db] = (row_count, digest.hexdigest())
+    return _column_hashes[db][1]
+
+
+## Fingerprint of the rates and rules a result depends on, e.g. rates_fingerprint(*app.rates).
+def rates_fingerprint(db, registry) -> str:
+    rules = repr(sorted(registry.rules.items()))
+    return hashlib.sha256(f"{_column_hash(db)}\0{rules}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path: str, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        if max_age_days <= 0:
+            raise ValueError("max_age_days must be positive")
+        self.path = path
+        self.max_age_seconds = max_age_days * 86400
+        self.stats = CacheStats()
+        # Several batch workers may share one file: WAL lets readers run while one of them writes
+        self._conn = sqlite3.connect(path, timeout = 30.0)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA cache_size = -65536")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute("CREATE TEMP TABLE lookup (series TEXT, principal REAL, start INTEGER, "
+                           "\"end\" INTEGER, judgment INTEGER)")
+        self._conn.commit()
+
+    # Looked up on every call rather than remembered: another process may prune the version at any time
+    def _version_id(self, rates: str, create: bool) -> Optional[int]:
+        row = self._conn.execute("SELECT id FROM rate_versions WHERE fingerprint = ?", (rates,)).fetchone()
+        if row is None and create:
+            self._conn.execute("INSERT INTO rate_versions (fingerprint) VALUES (?)", (rates,))
+            row = self._conn.execute("SELECT id FROM rate_versions WHERE fingerprint = ?", (rates,)).fetchone()
+        return None if row is None else row[0]
+
+    ## Cached results for the cases calculated with the given rates fingerprint and not yet expired.
+    ## Returns {case: interest} for the cases found; the others count as misses.
+    def get_many(self, rates: str, cases: Iterable[CaseKey]) -> dict[CaseKey, float]:
+        cases = list(cases)
+        version_id = self._version_id(rates, create = False)
+        if version_id is None:
+            self.stats.misses += len(cases)
+            return {}
+        by_ordinals = {}
+        for case in cases:
+            series_id, principal, start, end, judgment = case
+            by_ordinals[(series_id, principal, start.toordinal(), end.toordinal(), judgment.toordinal())] = case
+        with self._conn:
+            self._conn.execute("DELETE FROM lookup")
+            self._conn.executemany("INSERT INTO lookup VALUES (?, ?, ?, ?, ?)", by_ordinals.keys())
+            found_rows = self._conn.execute(
+                "SELECT i.series, i.principal, i.start, i.\"end\", i.judgment, i.interest "
+                "FROM lookup l JOIN interest i ON i.rates = ? AND i.series = l.series "
+                "AND i.principal = l.principal AND i.start = l.start AND i.\"end\" = l.\"end\" "
+                "AND i.judgment = l.judgment WHERE i.created >= ?",
+                (version_id, time.time() - self.max_age_seconds),
+            ).fetchall()
+
+        found = {by_ordinals[row[:5]]: row[5] for row in found_rows}
+        hits = sum(1 for case in cases if case in found)
+        self.stats.hits += hits
+        self.stats.misses += len(cases) - hits
+        return found
+
+    ## Stores (case, interest) results calculated with the given rates fingerprint.
+    ## Results for a NaN or infinite principal are not stored (SQLite cannot key on them).
+    def put_many(self, rates: str, results: Iterable[tuple[CaseKey, float]]) -> None:
+        now = time.time()
+        rows = [
+            (series_id, principal, start.toordinal(), end.toordinal(), judgment.toordinal(), interest, now)
+            for (series_id, principal, start, end, judgment), interest in results
+            if math.isfinite(principal) and math.isfinite(interest)
+        ]
+        if not rows:
+            return
+        with self._conn:
+            # The version is resolved inside the write transaction, so no prune can remove it before the insert
+            self._conn.execute("BEGIN IMMEDIATE")
+            version_id = self._version_id(rates, create = True)
+            self._conn.executemany("INSERT OR REPLACE INTO interest VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   ((version_id,) + row for row in rows))
+
+    ## Deletes expired entries and, if `rates` is given, every entry calculated with other rates.
+    ## Returns the number of entries deleted.
+    def prune(self, rates: Optional[str] = None) -> int:
+        with self._conn:
+            expired = self._conn.execute("DELETE FROM interest WHERE created < ?",
+                                         (time.time() - self.max_age_seconds,)).rowcount
+            stale = 0
+            if rates is not None:
+                stale = self._conn.execute(
+                    "DELETE FROM interest WHERE rates NOT IN (SELECT id FROM rate_versions WHERE fingerprint = ?)",
+                    (rates,),
+                ).rowcount
+                self._conn.execute("DELETE FROM rate_versions WHERE fingerprint <> ?", (rates,))
+        self.stats.evictions += expired
+        self.stats.invalidations += stale
+        return expired + stale
+
+    def clear(self) -> None:
+        with self._conn:
+            self.stats.invalidations += self._conn.execute("DELETE FROM interest").rowcount
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM interest").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+## calculate_interest for a list of cases through the cache: the whole list is looked up at once, and only the
+## cases not found are calculated (with app.calculate_interest) and then stored. Results come back in the order
+## of the cases. With errors="raise" the first case that fails raises its ValueError or OverflowError; with
+## errors="return" that case's result is the exception instead, so the caller can reject it and go on.
+def calculate_interest_cached(app, cache: ResultCache, cases: list[CaseKey], errors: str = "raise") -> list:
+    if errors not in ("raise", "return"):
+        raise ValueError("errors must be 'raise' or 'return'")
+    db, registry = app.rates
+    rates = rates_fingerprint(db, registry)
+    found = cache.get_many(rates, cases)
+    computed = {}
+    results = []
+    for case in cases:
+        result = found[case] if case in found else computed.get(case)
+        if result is None:
+            series_id, principal, start_date, end_date, judgment_date = case
+            try:
+                result = computed[case] = app.calculate_interest(principal, start_date, end_date, judgment_date,
+                                                                 series_id = series_id)
+            except (ValueError, OverflowError) as e:
+                if errors == "raise":
+                    raise
+                result = e
+        results.append(result)
+
+    # Results calculated after a reload swapped the rates must not be stored under the old fingerprint
+    if app.rates[0] is db:
+        cache.put_many(rates, computed.items())
+    return results
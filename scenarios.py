@@ -0,0 +1,263 @@
+## What-if interest under hypothetical future rates (NumPy required, as for vectorized.py).
+## The rate tables end at the last published rate, and calculate_interest assumes that rate holds forever.
+## A RateScenario replaces that assumption with a path of future rates: flat (the published assumption),
+## stepped (e.g. +/-50bp every quarter) or any custom list of (effective date, annual rate percent).
+##
+## Every scenario shares the historical part of the series' cumulative rate table (vectorized.RateCalendar);
+## only the days after the last published rate get one row per scenario. Interest for all cases under all
+## scenarios then comes out of the same array lookups as calculate_interest_many, as a (scenarios x cases)
+## array, instead of a full calculation per scenario. Under the flat scenario the results are identical to
+## calculate_interest_many.
+import sys
+from calendar import isleap
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Optional
+
+from series_registry import DEFAULT_SERIES_ID
+from vectorized import get_calendar, np, round_cents, to_ordinals
+
+
+## Daily rate for an annual rate taking effect on a date, as the published tables compute it:
+## annual / 100 / days in that year, to nine decimals.
+def daily_rate_decimal(annual_rate_percent: float, effective_date: date) -> float:
+    days_in_year = 366 if isleap(effective_date.year) else 365
+    return round(annual_rate_percent / 100 / days_in_year, 9)
+
+
+@dataclass(frozen = True)
+class RateScenario:
+    name: str
+    # (effective date, annual rate percent) after the last published rate, in ascending order. As in the
+    # tables, a rate's daily rate uses the length of the year it takes effect in, so a path that should follow
+    # leap years needs a 1/1 row each year. No rows: the last published rate holds (the flat scenario).
+    rates: tuple[tuple[date, float], ...] = ()
+
+    @classmethod
+    def flat(cls, name: str = "flat") -> "RateScenario":
+        return cls(name)
+
+    ## The last published annual rate of the series moved by step_bp basis points at each of the next
+    ## `quarters` calendar quarter starts (never below floor_percent), then held.
+    @classmethod
+    def stepped(cls, db, step_bp: float, quarters: int = 8, series_id: str = DEFAULT_SERIES_ID,
+                name: Optional[str] = None, floor_percent: float = 0.0) -> "RateScenario":
+        series = db.rate_series.get(series_id)
+        if not series:
+            raise ValueError(f"No rates found for series {series_id}")
+        last = series[len(series) - 1]
+
+        rates = []
+        annual = last.annual_rate_percent
+        year, month = last.effective_date.year, last.effective_date.month
+        for _ in range(quarters):
+            # Next quarter start after the current one
+            month = (month - 1) // 3 * 3 + 4
+            if month > 12:
+                year, month = year + 1, 1
+            annual = max(round(annual + step_bp / 100, 4), floor_percent)
+            rates.append((date(year, month, 1), annual))
+        return cls(name or f"{step_bp:+g}bp/quarter", tuple(rates))
+
+
+## Cumulative rate sums of one series under several scenarios, through horizon (a day ordinal).
+## Days up to the last published rate come from the shared RateCalendar; each scenario adds its own rows
+## for the days after it, built per rate period like the calendar's own extrapolation.
+class ScenarioCalendar:
+    def __init__(self, rate_calendar, scenarios: list[RateScenario], horizon: int):
+        self.calendar = rate_calendar
+        self.scenarios = scenarios
+        # Day index of the first day after the last published rate (RateCalendar index == ordinal - first)
+        size = rate_calendar.size
+        first_future = rate_calendar.first_ordinal + size
+        self.future_days = max(horizon - first_future + 1, 0)
+
+        t = np.arange(self.future_days + 1)
+        self.future_cumulative = np.empty((len(scenarios), len(t)))
+        self.future_daily = np.empty((len(scenarios), len(t)))
+        for s, scenario in enumerate(scenarios):
+            # Rate periods after the last published rate: start offsets and daily rates
+            starts = [0]
+            rates = [rate_calendar.last_daily]
+            for effective_date, annual in scenario.rates:
+                offset = effective_date.toordinal() - first_future
+                if offset < 0 or (len(starts) > 1 and offset <= starts[-1]):
+                    raise ValueError(f"Scenario {scenario.name}: rates must be in ascending order and take "
+                                     f"effect after the last published rate")
+                if offset == 0:
+                    rates[0] = daily_rate_decimal(annual, effective_date)
+                    continue
+                starts.append(offset)
+                rates.append(daily_rate_decimal(annual, effective_date))
+            prefix = [0.0]
+            for j in range(1, len(starts)):
+                prefix.append(prefix[-1] + rates[j - 1] * (starts[j] - starts[j - 1]))
+
+            starts_arr, rates_arr, prefix_arr = np.array(starts), np.array(rates), np.array(prefix)
+            j = np.searchsorted(starts_arr, t, side = "right") - 1
+            self.future_cumulative[s] = (rate_calendar.cumulative[size]
+                                         + (prefix_arr[j] + rates_arr[j] * (t - starts_arr[j])))
+            self.future_daily[s] = rates_arr[j]
+
+    ## Sum of daily rates for every day before each ordinal, per scenario: shape (scenarios, len(ordinals)).
+    def rate_sum_before(self, ordinals):
+        published = self.calendar
+        k = ordinals - published.first_ordinal
+        inside = published.cumulative[np.clip(k, 0, published.size)]
+        future = self.future_cumulative[:, np.clip(k - published.size, 0, self.future_days)]
+        return np.where(k > published.size, future, inside)
+
+    ## Daily rate in effect on each ordinal, per scenario, 0.0 before the first rate.
+    def daily_rate_on(self, ordinals):
+        published = self.calendar
+        k = ordinals - published.first_ordinal
+        inside = np.where(k < 0, 0.0, published.daily[np.clip(k, 0, published.size - 1)])
+        future = self.future_daily[:, np.clip(k - published.size, 0, self.future_days)]
+        return np.where(k >= published.size, future, inside)
+
+
+## Interest for arrays of judgments under every scenario: the scenario version of calculate_interest_many.
+## Returns an array of shape (len(scenarios), len(principals)) rounded to cents; row s is scenario s.
+def calculate_interest_scenarios(app, scenarios: list[RateScenario], principals, start_dates, end_dates,
+                                 judgment_dates = None, series_id: str = DEFAULT_SERIES_ID):
+    db, registry = app.rates
+    if series_id not in db.rate_series:
+        raise ValueError(f"Unknown rate series '{series_id}'")
+    if not scenarios:
+        raise ValueError("At least one scenario is required")
+
+    principal = np.asarray(principals, dtype = np.float64)
+    start = to_ordinals(start_dates)
+    end = to_ordinals(end_dates)
+    judgment = start if judgment_dates is None else to_ordinals(judgment_dates)
+    horizon = int(max(end.max(initial = 0), judgment.max(initial = 0))) + 1
+    scenario_calendar = ScenarioCalendar(get_calendar(db, series_id), scenarios, horizon)
+
+    days_inclusive = end - start + 1
+
+    # Same rules as calculate_interest_vectorized, with a leading scenario axis
+    static_interest = principal * scenario_calendar.daily_rate_on(judgment) * days_inclusive
+    accrued = principal * (scenario_calendar.rate_sum_before(end + 1) - scenario_calendar.rate_sum_before(start))
+    accrued = np.where((days_inclusive <= 0) | (start < scenario_calendar.calendar.first_ordinal), 0.0, accrued)
+
+    cutoff = (registry.get(series_id).static_rate_cutoff or date.min).toordinal()
+    interest = np.where(start < cutoff, static_interest, accrued)
+    return round_cents(interest)
+
+
+## Total interest of a set of open judgments (OpenJudgment, e.g. a Portfolio) accrued from each judgment date
+## through as_of, under each scenario. Cases of other series than series_id, or judged after as_of, are
+## left out. Returns {scenario name: total}.
+def portfolio_interest_scenarios(app, scenarios: list[RateScenario], cases: Iterable, as_of: date,
+                                 series_id: str = DEFAULT_SERIES_ID) -> dict[str, float]:
+    cases = [case for case in cases if case.series_id == series_id and case.judgment_date <= as_of]
+    if not cases:
+        return {scenario.name: 0.0 for scenario in scenarios}
+    judgment = np.array([case.judgment_date.toordinal() for case in cases], dtype = np.int64)
+    interest = calculate_interest_scenarios(
+        app, scenarios, [case.principal for case in cases], judgment,
+        np.full(len(cases), as_of.toordinal(), dtype = np.int64), judgment, series_id,
+    )
+    return {scenario.name: round(float(total), 2) for scenario, total in zip(scenarios, interest.sum(axis = 1))}
+
+
+## Reads custom scenarios from a CSV file with columns scenario, effective_date (MM/DD/YYYY) and
+## annual_rate_percent; rows of one scenario must be in date order.
+def load_scenarios(path: str) -> list[RateScenario]:
+    import csv
+
+    from date_codec import parse_date
+
+    paths: dict[str, list[tuple[date, float]]] = {}
+    with open(path, newline = "", encoding = "utf-8") as f:
+        for number, row in enumerate(csv.DictReader(f), start = 2):
+            try:
+                rates = paths.setdefault(row["scenario"].strip(), [])
+                rates.append((parse_date(row["effective_date"].strip()), float(row["annual_rate_percent"])))
+            except (KeyError, AttributeError, ValueError) as e:
+                raise ValueError(f"{path}: line {number}: {e}") from None
+    return [RateScenario(name, tuple(rates)) for name, rates in paths.items()]
+
+
+## `python main.py whatif cases.csv [--step -50 --step 50] [--quarters 8] [--scenarios custom.csv] [-o out.csv]
+##                                   [-f csv|jsonl]`
+## Cases use the batch columns. The output is the input rows with one interest_<scenario> column per scenario
+## (the flat scenario first); totals per scenario go to stderr.
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+    import csv
+
+    from batch import RowError, close_streams, detect_format, open_stream, parse_row, read_rows, reject_line
+
+    parser = argparse.ArgumentParser(prog = "whatif", description = "Interest for a file of cases under future "
+                                                                    "rate scenarios.")
+    parser.add_argument("input", nargs = "?", default = "-", help = "Input file (.csv or .jsonl). '-' for stdin.")
+    parser.add_argument("-o", "--output", default = "-", help = "Output CSV file. Defaults to stdout.")
+    parser.add_argument("-r", "--rejects", default = None, help = "Reject file (JSON lines). Defaults to stderr.")
+    parser.add_argument("-f", "--format", choices = ("csv", "jsonl"), default = None,
+                        help = "Input format. Detected from the file extension if omitted.")
+    parser.add_argument("--step", type = float, action = "append", default = None, metavar = "BP",
+                        help = "Basis points per quarter for a stepped scenario (repeatable; default -50 and 50).")
+    parser.add_argument("--quarters", type = int, default = 8, help = "Quarters the steps continue (default 8).")
+    parser.add_argument("--scenarios", default = None, metavar = "CSV",
+                        help = "Custom scenarios: scenario, effective_date, annual_rate_percent columns.")
+    parser.add_argument("--series", default = DEFAULT_SERIES_ID)
+    args = parser.parse_args(argv)
+
+    if app is None:
+        from main import App
+        app = App()
+
+    try:
+        scenarios = [RateScenario.flat()]
+        scenarios += [RateScenario.stepped(app.db, step, args.quarters, args.series)
+                      for step in (args.step if args.step is not None else (-50.0, 50.0))]
+        if args.scenarios:
+            scenarios += load_scenarios(args.scenarios)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    fmt = detect_format(None if args.input == "-" else args.input, args.format)
+    in_stream = open_stream(args.input, "r", sys.stdin)
+    reject_stream = open_stream(args.rejects, "w", sys.stderr)
+    rows, cases = [], []
+    try:
+        for line_number, row in read_rows(in_stream, fmt):
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                if (str(row.get("series") or "").strip() or args.series) != args.series:
+                    raise RowError(f"Row is for series '{row['series']}'; this run is for {args.series}")
+                cases.append(parse_row(row))
+                rows.append(row)
+            except (RowError, ValueError) as e:
+                reject_stream.write(reject_line(line_number, e, row))
+    finally:
+        close_streams(in_stream, reject_stream)
+
+    try:
+        if cases:
+            principals, start_dates, end_dates, judgment_dates = zip(*cases)
+            interest = calculate_interest_scenarios(app, scenarios, principals, start_dates, end_dates,
+                                                    judgment_dates, args.series)
+        else:
+            interest = np.zeros((len(scenarios), 0))
+    except ValueError as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    columns = [f"interest_{scenario.name}" for scenario in scenarios]
+    out_stream = open_stream(args.output, "w", sys.stdout)
+    try:
+        fieldnames = list(rows[0].keys()) + columns if rows else columns
+        writer = csv.DictWriter(out_stream, fieldnames = fieldnames, extrasaction = "ignore")
+        writer.writeheader()
+        for i, row in enumerate(rows):
+            writer.writerow({**row, **{column: f"{interest[s, i]:.2f}" for s, column in enumerate(columns)}})
+    finally:
+        close_streams(out_stream)
+
+    for scenario, total in zip(scenarios, interest.sum(axis = 1)):
+        print(f"{scenario.name}: {len(rows)} cases, total interest {total:,.2f}", file = sys.stderr)
+    return 0
@@ -0,0 +1,100 @@
+## Registry of named rate series and the calculation rules that go with each one.
+## Rates live in rate_tables/<series_id>.csv; the rules for each series live in rate_tables/series.json:
+##
+##     {
+##       "FL_POST_JUDGMENT": {
+##         "name": "Florida post-judgment interest",
+##         "jurisdiction": "FL",
+##         "kind": "post_judgment",
+##         "static_rate_cutoff": "10/01/2011"
+##       }
+##     }
+##
+## static_rate_cutoff: judgments starting before this date accrue at the single rate in effect on the
+## judgment date. Omit it (or use null) for series where the rate always changes with the table.
+##
+## The Florida rule above is also built in (BUILTIN_RULES), so it still applies when series.json is missing
+## or does not list FL_POST_JUDGMENT. An entry in series.json replaces the built-in one.
+import json
+import os
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from date_codec import parse_date
+from rates import RATE_TABLE_DIR, SERIES_REGISTRY_FILE
+
+SERIES_REGISTRY_PATH = os.path.join(RATE_TABLE_DIR, SERIES_REGISTRY_FILE)
+DEFAULT_SERIES_ID = "FL_POST_JUDGMENT"
+
+
+@dataclass(frozen = True)
+class SeriesRule:
+    series_id: str
+    name: str = ""
+    jurisdiction: str = ""
+    kind: str = "post_judgment"           # e.g. post_judgment, pre_judgment, federal
+    static_rate_cutoff: Optional[date] = None
+
+    ## True when a judgment starting on start_date keeps the judgment-date rate for its whole span.
+    def uses_static_rate(self, start_date: date) -> bool:
+        return self.static_rate_cutoff is not None and start_date < self.static_rate_cutoff
+
+
+# Rules that apply without a series.json entry
+BUILTIN_RULES = {
+    DEFAULT_SERIES_ID: SeriesRule(
+        series_id = DEFAULT_SERIES_ID,
+        name = "Florida post-judgment interest",
+        jurisdiction = "FL",
+        kind = "post_judgment",
+        static_rate_cutoff = date(2011, 10, 1),
+    ),
+}
+
+
+class SeriesRegistry:
+    def __init__(self, rules: Optional[list[SeriesRule]] = None):
+        self.rules: dict[str, SeriesRule] = {}
+        for rule in rules or []:
+            self.register(rule)
+
+    def register(self, rule: SeriesRule) -> None:
+        self.rules[rule.series_id] = rule
+
+    ## Rules for a series. Series with rates but no registry entry get the built-in rule if there is one,
+    ## otherwise the default rule (no static cutoff).
+    def get(self, series_id: str) -> SeriesRule:
+        rule = self.rules.get(series_id)
+        if rule is None:
+            return BUILTIN_RULES.get(series_id) or SeriesRule(series_id)
+        return rule
+
+    def __contains__(self, series_id: str) -> bool:
+        return series_id in self.rules
+
+
+## Reads rate_tables/series.json. A missing file gives an empty registry.
+def load_series_registry(path: str = SERIES_REGISTRY_PATH) -> SeriesRegistry:
+    registry = SeriesRegistry()
+    if not os.path.exists(path):
+        return registry
+
+    with open(path, encoding = "utf-8") as f:
+        entries = json.load(f)
+
+    for series_id, entry in entries.items():
+        cutoff = entry.get("static_rate_cutoff")
+        try:
+            cutoff = parse_date(cutoff) if cutoff else None
+        except ValueError:
+            raise ValueError(f"{path}: invalid static_rate_cutoff '{cutoff}' for {series_id}. "
+                             f"Please use MM/DD/YYYY.") from None
+        registry.register(SeriesRule(
+            series_id = series_id,
+            name = entry.get("name", ""),
+            jurisdiction = entry.get("jurisdiction", ""),
+            kind = entry.get("kind", "post_judgment"),
+            static_rate_cutoff = cutoff,
+        ))
+    return registry
@@ -0,0 +1,350 @@
+## Long-running local HTTP/JSON service.
+## One process holds a single App (and its RateDatabase and factor cache) and answers requests over
+## keep-alive HTTP/1.1 connections, instead of spawning `main.py` per calculation.
+##
+## Endpoints:
+##   GET  /rate?date=MM/DD/YYYY[&series=FL_POST_JUDGMENT]
+##   GET  /rates?date=MM/DD/YYYY   rates of every series on the date
+##   POST /interest   {"principal", "start_date", "end_date", "judgment_date"?, "method"?, "series"?}
+##   POST /batch      {"judgments": [{...same fields as /interest...}, ...]}
+##   GET  /stats      per-endpoint request counts and latency percentiles
+##   POST /reload     reload the rate tables now (also done every --watch-rates seconds when given)
+##   GET  /health
+##
+## Reloading swaps in the new rates atomically: requests already running finish on the old version, and only
+## cached factors that reach the first changed effective date are dropped (see App.reload_rates).
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import deque
+from datetime import date
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from batch import RowError, parse_row
+from date_codec import format_date, parse_date
+from series_registry import DEFAULT_SERIES_ID
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 16 * 1024 * 1024
+# Keep-alive connections with no new request for this long are closed
+IDLE_TIMEOUT_SECONDS = 30.0
+# Latency samples kept per endpoint for the percentile report
+LATENCY_WINDOW = 10_000
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+## Error with an HTTP status, turned into a JSON {"error": ...} response.
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+## Rolling latency samples per endpoint, reported as percentiles in milliseconds.
+class LatencyStats:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.counts: dict[str, int] = {}
+        self.samples: dict[str, deque] = {}
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        self.samples.setdefault(endpoint, deque(maxlen = self.window)).append(seconds)
+
+    def report(self) -> dict:
+        report = {}
+        for endpoint, samples in self.samples.items():
+            ordered = sorted(samples)
+            report[endpoint] = {
+                "count": self.counts[endpoint],
+                "p50_ms": _percentile(ordered, 50) * 1000,
+                "p90_ms": _percentile(ordered, 90) * 1000,
+                "p99_ms": _percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return report
+
+
+## Nearest-rank percentile of an already sorted list.
+def _percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def _query_date(query: dict):
+    value = query.get("date", [None])[0]
+    if not value:
+        raise HTTPError(400, "Missing 'date' query parameter")
+    try:
+        return parse_date(value.strip())
+    except ValueError:
+        raise HTTPError(400, f"Invalid date '{value}'. Please use MM/DD/YYYY.") from None
+
+
+def _rate_json(rate) -> Optional[dict]:
+    if rate is None:
+        return None
+    return {
+        "effective_date": format_date(rate.effective_date),
+        "annual_rate_percent": rate.annual_rate_percent,
+        "daily_rate_decimal": rate.daily_rate_decimal,
+    }
+
+
+def _changes_json(changes: dict) -> dict:
+    return {
+        series_id: None if changed == date.min else format_date(changed)
+        for series_id, changed in sorted(changes.items())
+    }
+
+
+class InterestService:
+    def __init__(self, app):
+        self.app = app
+        self.stats = LatencyStats()
+        self.routes = {
+            ("GET", "/rate"): self.handle_rate,
+            ("GET", "/rates"): self.handle_rates,
+            ("POST", "/interest"): self.handle_interest,
+            ("POST", "/batch"): self.handle_batch,
+            ("GET", "/stats"): self.handle_stats,
+            ("GET", "/health"): self.handle_health,
+            ("POST", "/reload"): self.handle_reload,
+        }
+
+    def handle_health(self, query: dict, body: Optional[dict]) -> dict:
+        return {"status": "ok"}
+
+    ## Reloads the rate tables. "changed" maps each changed series to its first changed effective date,
+    ## or null when the series' rules in series.json changed.
+    def handle_reload(self, query: dict, body: Optional[dict]) -> dict:
+        try:
+            changes = self.app.reload_rates()
+        except (OSError, ValueError) as e:
+            raise HTTPError(400, f"Rates not reloaded: {e}") from None
+        return {"changed": _changes_json(changes)}
+
+    def handle_stats(self, query: dict, body: Optional[dict]) -> dict:
+        cache = self.app.factor_cache.stats
+        return {
+            "endpoints": self.stats.report(),
+            "factor_cache": {"hits": cache.hits, "misses": cache.misses, "evictions": cache.evictions,
+                             "hit_rate": cache.hit_rate},
+        }
+
+    def handle_rate(self, query: dict, body: Optional[dict]) -> dict:
+        as_of = _query_date(query)
+        series_id = query.get("series", [DEFAULT_SERIES_ID])[0]
+        rate = self.app.db.get_rate_as_of(series_id, as_of)
+        return {"series": series_id, "as_of": format_date(as_of), "rate": _rate_json(rate)}
+
+    def handle_rates(self, query: dict, body: Optional[dict]) -> dict:
+        as_of = _query_date(query)
+        rates = self.app.db.get_rates_on(as_of)
+        return {
+            "as_of": format_date(as_of),
+            "rates": {series_id: _rate_json(rate) for series_id, rate in sorted(rates.items())},
+        }
+
+    def _calculate(self, row: dict) -> dict:
+        principal, start_date, end_date, judgment_date = parse_row(row)
+        method = row.get("method", "periods")
+        if not isinstance(method, str):
+            raise RowError("method must be a string")
+        series_id = str(row.get("series") or "").strip() or DEFAULT_SERIES_ID
+        interest = self.app.calculate_interest(principal, start_date, end_date, judgment_date, method = method,
+                                               series_id = series_id)
+        return {**row, "interest": interest}
+
+    def handle_interest(self, query: dict, body: Optional[dict]) -> dict:
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        try:
+            return self._calculate(body)
+        except (RowError, ValueError, OverflowError) as e:
+            raise HTTPError(400, str(e)) from None
+
+    ## Bad rows do not fail the request; each one gets an "error" entry at its position instead.
+    def handle_batch(self, query: dict, body: Optional[dict]) -> dict:
+        judgments = body.get("judgments") if isinstance(body, dict) else None
+        if not isinstance(judgments, list):
+            raise HTTPError(400, "Request body must be a JSON object with a 'judgments' list")
+
+        results = []
+        rejected = 0
+        for row in judgments:
+            try:
+                if not isinstance(row, dict):
+                    raise RowError("Each judgment must be a JSON object")
+                results.append(self._calculate(row))
+            except (RowError, ValueError, OverflowError) as e:
+                rejected += 1
+                results.append({"error": str(e), "row": row})
+        return {"results": results, "rejected": rejected}
+
+    ## Routes one parsed request. Returns (status, payload).
+    def dispatch(self, method: str, target: str, raw_body: bytes) -> tuple[int, dict]:
+        parts = urlsplit(target)
+        handler = self.routes.get((method, parts.path))
+        if handler is None:
+            if any(path == parts.path for _, path in self.routes):
+                raise HTTPError(405, f"{method} is not allowed on {parts.path}")
+            raise HTTPError(404, f"No such endpoint {parts.path}")
+
+        body = None
+        if raw_body:
+            try:
+                body = json.loads(raw_body)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                raise HTTPError(400, "Request body is not valid JSON") from None
+
+        started = time.perf_counter()
+        try:
+            return 200, handler(parse_qs(parts.query), body)
+        finally:
+            self.stats.record(parts.path, time.perf_counter() - started)
+
+    ## Serves one connection until the client closes it, asks to close, or goes idle.
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, keep_alive = False)
+                    break
+
+                headers = await self._read_headers(reader)
+                if headers is None:
+                    await self._respond(writer, 400, {"error": "Too many or malformed headers"}, keep_alive = False)
+                    break
+
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.0":
+                    keep_alive = connection == "keep-alive"
+                else:
+                    keep_alive = connection != "close"
+
+                try:
+                    length = int(headers.get("content-length", "0"))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413 if length > 0 else 400,
+                                        {"error": "Invalid or too large Content-Length"}, keep_alive = False)
+                    break
+                raw_body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = self.dispatch(method.upper(), target, raw_body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:  # keep serving other requests
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_headers(self, reader: asyncio.StreamReader) -> Optional[dict]:
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, sep, value = line.decode("latin-1").partition(":")
+            if not sep:
+                return None
+            headers[name.strip().lower()] = value.strip()
+        return None
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+## Polls the rate tables every `interval` seconds and reloads them when the files change.
+## A table that fails validation is reported and the current rates stay in use.
+async def watch_rates(app, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            changes = app.reload_rates_if_changed()
+        except (OSError, ValueError) as e:
+            print(f"Rates not reloaded: {e}", file = sys.stderr, flush = True)
+            continue
+        if changes:
+            print(f"Rates reloaded: {json.dumps(_changes_json(changes))}", flush = True)
+
+
+async def serve(app, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                watch_interval: Optional[float] = None) -> None:
+    service = InterestService(app)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+    print(f"CaseFlow service listening on {addresses}", flush = True)
+    watcher = asyncio.create_task(watch_rates(app, watch_interval)) if watch_interval else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog = "serve", description = "Run the CaseFlow HTTP/JSON service.")
+    parser.add_argument("--host", default = DEFAULT_HOST, help = f"Bind address (default {DEFAULT_HOST}).")
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT, help = f"Port (default {DEFAULT_PORT}).")
+    parser.add_argument("--watch-rates", type = float, default = None, metavar = "SECONDS",
+                        help = "Check the rate tables for changes every SECONDS and reload them.")
+    args = parser.parse_args(argv)
+
+    if app is None:
+        from main import App
+        app = App()
+
+    try:
+        asyncio.run(serve(app, args.host, args.port, args.watch_rates))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
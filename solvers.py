@@ -0,0 +1,211 @@
+## Inverse and payoff queries on top of the fixed-point engine (fixed_point.py).
+##   date_interest_reaches()  first day on which accrued interest reaches a target amount
+##   payoff_on()              principal + interest through a day, and the per diem going forward
+## Both read the per-series prefix sums of daily rate units (FixedPointSeries) and binary-search the rate
+## periods, so each query costs O(log periods) whatever the span, instead of repeated forward calculations.
+## Amounts follow calculate_interest(method="exact"): integer cents with one half-up rounding step.
+##
+## `python main.py solve cases.csv` answers both for a CSV/JSONL file of cases (see main() below).
+import math
+import sys
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import fixed_point
+from batch import RowError, _parse_date, close_streams, detect_format, open_stream, read_rows, reject_line
+from date_codec import format_date
+from fixed_point import RATE_SCALE
+from series_registry import DEFAULT_SERIES_ID
+
+_MAX_ORDINAL = date.max.toordinal()
+
+# Columns added to each output row by the batch solver
+SOLVE_FIELDS = ("reaches_on", "interest", "payoff", "per_diem")
+
+
+@dataclass(frozen = True, slots = True)
+class Payoff:
+    as_of: date
+    principal_cents: int
+    interest_cents: int             # accrued from the start date through as_of, inclusive
+    per_diem_cents: int             # interest for one more day at the rate in effect on as_of
+
+    @property
+    def payoff_cents(self) -> int:
+        return self.principal_cents + self.interest_cents
+
+
+def _check(db, series_id: str, principal_cents: int) -> None:
+    if series_id not in db.rate_series:
+        raise ValueError(f"Unknown rate series '{series_id}'")
+    if principal_cents <= 0:
+        raise ValueError("Principal must be positive")
+
+
+## Smallest n >= 0 with principal_cents * n rounding (half up) to at least target_cents, i.e.
+## 2 * principal_cents * n >= (2 * target_cents - 1) * RATE_SCALE. n is in daily rate units.
+def _units_needed(principal_cents: int, target_cents: int) -> int:
+    if target_cents <= 0:
+        return 0
+    return -(-(2 * target_cents - 1) * RATE_SCALE // (2 * principal_cents))
+
+
+## First day D >= start_date on which interest from start_date through D (inclusive) reaches target_cents,
+## or None if it never does (no rate on the start date, a zero rate from some point on, or not by date.max).
+def date_interest_reaches(app, principal_cents: int, target_cents: int, start_date: date,
+                          judgment_date: Optional[date] = None,
+                          series_id: str = DEFAULT_SERIES_ID) -> Optional[date]:
+    db, registry = app.rates
+    _check(db, series_id, principal_cents)
+    judgment_date = judgment_date or start_date
+    series = fixed_point.get_series(db, series_id)
+    need = _units_needed(principal_cents, target_cents)
+    start = start_date.toordinal()
+
+    if registry.get(series_id).uses_static_rate(start_date):
+        rate_units = series.rate_units_on(judgment_date.toordinal())
+        if not rate_units:
+            return None
+        ## Start/End day inclusive: at least one day always accrues
+        days = max(-(-need // rate_units), 1)
+        if start + days - 1 > _MAX_ORDINAL:
+            return None
+        return start_date + timedelta(days = days - 1)
+
+    if series.rate_units_on(start) is None:
+        return None
+    if need == 0:
+        return start_date
+
+    # units_before(x) is non-decreasing and linear within a period: find the period where it reaches
+    # goal, then the day inside it. x is the day after the end date.
+    goal = series.units_before(start) + need
+    i = bisect_left(series.prefix_units, goal) - 1
+    if i < 0:
+        i = 0
+    rate_units = series.rate_units[i]
+    if rate_units == 0:
+        return None
+    x = series.effective_ordinals[i] + -(-(goal - series.prefix_units[i]) // rate_units)
+    if x - 1 > _MAX_ORDINAL:
+        return None
+    return date.fromordinal(max(x - 1, start))
+
+
+## Payoff on as_of: principal, interest from start_date through as_of and the per diem after it.
+def payoff_on(app, principal_cents: int, start_date: date, as_of: date, judgment_date: Optional[date] = None,
+              series_id: str = DEFAULT_SERIES_ID) -> Payoff:
+    db, registry = app.rates
+    _check(db, series_id, principal_cents)
+    if as_of < start_date:
+        raise ValueError("as_of is before start_date")
+    judgment_date = judgment_date or start_date
+    cutoff = registry.get(series_id).static_rate_cutoff or date.min
+
+    interest = fixed_point.interest_cents(db, series_id, principal_cents, start_date, as_of, judgment_date,
+                                          static_rate_cutoff = cutoff)
+    series = fixed_point.get_series(db, series_id)
+    if start_date < cutoff:
+        rate_units = series.rate_units_on(judgment_date.toordinal())
+    elif series.rate_units_on(start_date.toordinal()) is None:
+        rate_units = None
+    else:
+        # The day after as_of accrues at the rate in effect on that day
+        rate_units = series.rate_units_on(as_of.toordinal() + 1)
+    per_diem = fixed_point.cents_for_units(principal_cents, rate_units or 0)
+    return Payoff(as_of, principal_cents, interest, per_diem)
+
+
+def _cents_str(cents: int) -> str:
+    return f"{cents / 100:.2f}"
+
+
+## Batch solver: each input row has principal and start_date (optional judgment_date and series) plus
+## target_interest, as_of, or both. Output rows add reaches_on for a target and interest, payoff and
+## per_diem for an as_of date. Rows are read, solved and written one at a time.
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+    import csv
+    import json
+
+    parser = argparse.ArgumentParser(prog = "solve",
+                                     description = "Payoff and target-interest dates for a file of cases.")
+    parser.add_argument("input", nargs = "?", default = "-", help = "Input file (.csv or .jsonl). '-' for stdin.")
+    parser.add_argument("-o", "--output", default = "-", help = "Output file. Defaults to stdout.")
+    parser.add_argument("-r", "--rejects", default = None, help = "Reject file (JSON lines). Defaults to stderr.")
+    parser.add_argument("-f", "--format", choices = ("csv", "jsonl"), default = None,
+                        help = "Input/output format. Detected from the file extension if omitted.")
+    args = parser.parse_args(argv)
+    fmt = detect_format(None if args.input == "-" else args.input, args.format)
+
+    if app is None:
+        from main import App
+        app = App()
+
+    in_stream = open_stream(args.input, "r", sys.stdin)
+    out_stream = open_stream(args.output, "w", sys.stdout)
+    reject_stream = open_stream(args.rejects, "w", sys.stderr)
+    writer = None
+    try:
+        for line_number, row in read_rows(in_stream, fmt):
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                result = _solve_row(app, row)
+            except (RowError, ValueError, OverflowError) as e:
+                reject_stream.write(reject_line(line_number, e, row))
+                continue
+
+            if fmt == "jsonl":
+                out_stream.write(json.dumps(result) + "\n")
+                continue
+            if writer is None:
+                fieldnames = list(row.keys()) + [k for k in SOLVE_FIELDS if k not in row]
+                writer = csv.DictWriter(out_stream, fieldnames = fieldnames, extrasaction = "ignore")
+                writer.writeheader()
+            writer.writerow(result)
+    finally:
+        close_streams(in_stream, out_stream, reject_stream)
+    return 0
+
+
+## Dollar amount from a row as integer cents, or None if the field is empty.
+def _amount_cents(row: dict, field: str) -> Optional[int]:
+    value = str(row.get(field) or "").strip().replace(",", "").lstrip("$")
+    if not value:
+        return None
+    try:
+        amount = float(value)
+    except ValueError:
+        raise RowError(f"Invalid {field} '{row.get(field)}'") from None
+    # Same limits as batch.parse_row: "nan", "inf" and amounts past the float range ("1e400") are rejected
+    if not math.isfinite(amount) or amount < 0:
+        raise RowError(f"Invalid {field} '{row.get(field)}'. It must be a finite amount of 0 or more.")
+    return fixed_point.to_cents(value)
+
+
+def _solve_row(app, row: dict) -> dict:
+    principal_cents = _amount_cents(row, "principal")
+    if principal_cents is None:
+        raise RowError("Missing principal")
+    start_date = _parse_date(row, "start_date")
+    judgment_date = _parse_date(row, "judgment_date") if str(row.get("judgment_date") or "").strip() else start_date
+    series_id = str(row.get("series") or "").strip() or DEFAULT_SERIES_ID
+
+    target_cents = _amount_cents(row, "target_interest")
+    as_of = str(row.get("as_of") or "").strip()
+    if target_cents is None and not as_of:
+        raise RowError("Row needs target_interest, as_of, or both")
+
+    result = dict(row)
+    if target_cents is not None:
+        reaches = date_interest_reaches(app, principal_cents, target_cents, start_date, judgment_date, series_id)
+        result["reaches_on"] = format_date(reaches) if reaches else ""
+    if as_of:
+        payoff = payoff_on(app, principal_cents, start_date, _parse_date(row, "as_of"), judgment_date, series_id)
+        result["interest"] = _cents_str(payoff.interest_cents)
+        result["payoff"] = _cents_str(payoff.payoff_cents)
+        result["per_diem"] = _cents_str(payoff.per_diem_cents)
+    return result
@@ -0,0 +1,361 @@
+## Document templates for demand letters, satisfaction statements and other merges.
+##
+## Syntax:
+##   {{ field }}                         value of a field, e.g. {{ case_id }}
+##   {{ field | filter | filter }}       filters: money (1,234.56), date (MM/DD/YYYY), upper, lower, title
+##   {{ item.attribute }}                attribute of a loop item or nested record
+##   {% for line in schedule %} ... {% endfor %}
+##   {% if field %} ... {% endif %}      rendered when the value is truthy
+##
+## A template is parsed and compiled once into a Python render function, and compiled templates are cached
+## by a hash of their text, so merging thousands of cases parses the template once. merge() renders one case
+## at a time from a stream of rows and writes each document as soon as it is rendered.
+##
+## Fields available for a case (see case_fields()): case_id, principal, start_date, end_date, judgment_date,
+## series, days, interest, total_due, today, schedule (the per-rate-period lines from schedule.py, only
+## calculated when the template uses them), plus every column of the input row.
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Iterator, Optional, TextIO
+
+from date_codec import format_date
+from series_registry import DEFAULT_SERIES_ID
+
+# Fields every case record has, whatever the input columns
+CASE_FIELDS = ("case_id", "principal", "start_date", "end_date", "judgment_date", "series", "days", "interest",
+               "total_due", "today", "schedule")
+
+TEMPLATE_CACHE_SIZE = 32
+
+_TAG = re.compile(r"({{.*?}}|{%.*?%})", re.DOTALL)
+# No part of a name may start with "_", so a template cannot reach __class__, __globals__ and the like
+_NAME = re.compile(r"[A-Za-z][A-Za-z0-9_]*(\.[A-Za-z][A-Za-z0-9_]*)*$")
+
+
+## Raised for a template that cannot be compiled, or a field missing at render time.
+## The message names the line of the template.
+class TemplateError(ValueError):
+    pass
+
+
+def _money(value) -> str:
+    return f"{float(value):,.2f}"
+
+
+def _date(value) -> str:
+    if isinstance(value, date):
+        return format_date(value)
+    return str(value)
+
+
+FILTERS = {
+    "money": _money,
+    "date": _date,
+    "upper": lambda value: str(value).upper(),
+    "lower": lambda value: str(value).lower(),
+    "title": lambda value: str(value).title(),
+}
+
+
+## Default formatting without a filter: dates as MM/DD/YYYY, everything else as str(). Use | money for amounts.
+def _text(value) -> str:
+    if isinstance(value, date):
+        return _date(value)
+    return "" if value is None else str(value)
+
+
+def _lookup(scope: dict, name: str, line: int):
+    try:
+        return scope[name]
+    except KeyError:
+        raise TemplateError(f"line {line}: missing field '{name}'") from None
+
+
+## The values of a {% for %} block; a value that cannot be looped over is a TemplateError naming the line.
+def _iterate(value, name: str, line: int):
+    try:
+        return iter(value)
+    except TypeError:
+        raise TemplateError(f"line {line}: cannot loop over '{name}' ({type(value).__name__})") from None
+
+
+def _filter(name: str, value, line: int) -> str:
+    try:
+        return FILTERS[name](value)
+    except (TypeError, ValueError) as e:
+        raise TemplateError(f"line {line}: filter '{name}' failed: {e}") from None
+
+
+def _attribute(value, name: str, line: int):
+    if isinstance(value, dict):
+        return _lookup(value, name, line)
+    try:
+        return getattr(value, name)
+    except AttributeError:
+        raise TemplateError(f"line {line}: '{name}' not found") from None
+
+
+@dataclass(frozen = True)
+class Template:
+    digest: str
+    fields: frozenset           # top-level fields the template reads (loop variables excluded)
+    render_function: object
+
+    ## Renders one document for a record (a dict of fields).
+    def render(self, record: dict) -> str:
+        parts: list[str] = []
+        self.render_function(record, parts.append)
+        return "".join(parts)
+
+    def uses(self, field: str) -> bool:
+        return field in self.fields
+
+
+## Parses template text into Python source for a render(scope, write) function.
+## Returns (source, fields read from the record).
+def _generate(text: str) -> tuple[str, set[str]]:
+    code = ["def render(scope, write):"]
+    indent = 1
+    # (kind, line, loop variables outside the block) for every open block
+    blocks: list[tuple[str, int, dict[str, str]]] = []
+    loop_vars: dict[str, str] = {}
+    fields: set[str] = set()
+    counter = 0
+
+    def value_expr(path: str, line: int) -> str:
+        if any(part.startswith("_") for part in path.split(".")):
+            raise TemplateError(f"line {line}: invalid field name '{path}' (names cannot start with '_')")
+        if not _NAME.match(path):
+            raise TemplateError(f"line {line}: invalid field name '{path}'")
+        head, *rest = path.split(".")
+        if head in loop_vars:
+            expr = loop_vars[head]
+        else:
+            fields.add(head)
+            expr = f"_lookup(scope, {head!r}, {line})"
+        for name in rest:
+            expr = f"_attribute({expr}, {name!r}, {line})"
+        return expr
+
+    def emit(statement: str) -> None:
+        code.append("    " * indent + statement)
+
+    line = 1
+    for token in _TAG.split(text):
+        if not token:
+            continue
+        token_line = line
+        line += token.count("\n")
+
+        if token.startswith("{{") and token.endswith("}}"):
+            expression, *filters = [part.strip() for part in token[2:-2].split("|")]
+            expr = value_expr(expression, token_line)
+            if not filters:
+                expr = f"_text({expr})"
+            for name in filters:
+                if name not in FILTERS:
+                    raise TemplateError(f"line {token_line}: unknown filter '{name}'")
+                expr = f"_filter({name!r}, {expr}, {token_line})"
+            emit(f"write({expr})")
+            continue
+
+        if token.startswith("{%") and token.endswith("%}"):
+            words = token[2:-2].split()
+            if len(words) == 4 and words[0] == "for" and words[2] == "in":
+                if not _NAME.match(words[1]) or "." in words[1]:
+                    raise TemplateError(f"line {token_line}: invalid loop variable '{words[1]}'")
+                iterable = value_expr(words[3], token_line)
+                counter += 1
+                local = f"_v{counter}"
+                emit(f"for {local} in _iterate({iterable}, {words[3]!r}, {token_line}):")
+                indent += 1
+                emit("pass")
+                blocks.append(("for", token_line, loop_vars))
+                loop_vars = {**loop_vars, words[1]: local}
+            elif len(words) == 2 and words[0] == "if":
+                emit(f"if {value_expr(words[1], token_line)}:")
+                indent += 1
+                emit("pass")
+                blocks.append(("if", token_line, loop_vars))
+            elif words in (["endfor"], ["endif"]):
+                if not blocks or blocks[-1][0] != words[0][3:]:
+                    raise TemplateError(f"line {token_line}: unexpected {{% {words[0]} %}}")
+                _, _, loop_vars = blocks.pop()
+                indent -= 1
+            else:
+                raise TemplateError(f"line {token_line}: unknown tag '{token.strip()}'")
+            continue
+
+        emit(f"write({token!r})")
+
+    if blocks:
+        kind, opened, _ = blocks[-1]
+        raise TemplateError(f"line {opened}: {{% {kind} %}} is never closed")
+    emit("return None")
+    return "\n".join(code), fields
+
+
+_cache: "OrderedDict[str, Template]" = OrderedDict()
+
+
+## Compiles template text, or returns the cached compiled template for the same text.
+def compile_template(text: str) -> Template:
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    template = _cache.get(digest)
+    if template is not None:
+        _cache.move_to_end(digest)
+        return template
+
+    source, fields = _generate(text)
+    namespace = {"_lookup": _lookup, "_attribute": _attribute, "_text": _text, "_filter": _filter,
+                 "_iterate": _iterate}
+    exec(compile(source, f"<template {digest[:12]}>", "exec"), namespace)
+    template = Template(digest, frozenset(fields), namespace["render"])
+
+    _cache[digest] = template
+    while len(_cache) > TEMPLATE_CACHE_SIZE:
+        _cache.popitem(last = False)
+    return template
+
+
+def load_template(path: str) -> Template:
+    with open(path, encoding = "utf-8") as f:
+        text = f.read()
+    try:
+        return compile_template(text)
+    except TemplateError as e:
+        raise TemplateError(f"{path}: {e}") from None
+
+
+## Problems with a template: syntax errors, and fields that are neither case fields nor in `columns`
+## (the input file's columns). An empty list means the template is ready to merge.
+def validate_template(text: str, columns: Iterable[str] = ()) -> list[str]:
+    try:
+        template = compile_template(text)
+    except TemplateError as e:
+        return [str(e)]
+    known = set(CASE_FIELDS) | set(columns)
+    return [f"unknown field '{name}'" for name in sorted(template.fields - known)]
+
+
+## The record a template is rendered against, for one input row.
+## The interest schedule is only calculated when the template uses it.
+def case_fields(app, row: dict, line_number: int = 0, with_schedule: bool = False) -> dict:
+    from batch import parse_row
+    from schedule import iter_interest_schedule
+
+    principal, start_date, end_date, judgment_date = parse_row(row)
+    series_id = str(row.get("series") or "").strip() or DEFAULT_SERIES_ID
+    interest = app.calculate_interest(principal, start_date, end_date, judgment_date, series_id = series_id)
+    record = dict(row)
+    record.update({
+        "case_id": str(row.get("case_id") or "").strip() or str(line_number),
+        "principal": principal,
+        "start_date": start_date,
+        "end_date": end_date,
+        "judgment_date": judgment_date,
+        "series": series_id,
+        ## Start/End day inclusive
+        "days": (end_date - start_date).days + 1,
+        "interest": interest,
+        "total_due": round(principal + interest, 2),
+        "today": date.today(),
+        "schedule": (),
+    })
+    if with_schedule:
+        record["schedule"] = list(iter_interest_schedule(app, principal, start_date, end_date, judgment_date,
+                                                         series_id))
+    return record
+
+
+## Renders one document per row as the rows are read. Yields (case_id, document).
+## Rows that fail (bad input or a missing field) go to on_reject(line_number, error, row) and are skipped.
+def render_cases(app, template: Template, rows: Iterable[tuple[int, object]],
+                 on_reject = None) -> Iterator[tuple[str, str]]:
+    from batch import RowError
+
+    with_schedule = template.uses("schedule")
+    for line_number, row in rows:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            record = case_fields(app, row, line_number, with_schedule)
+            document = template.render(record)
+        except (RowError, ValueError, OverflowError) as e:
+            if on_reject is not None:
+                on_reject(line_number, e, None if isinstance(row, RowError) else row)
+            continue
+        yield record["case_id"], document
+
+
+## Writes every document to one stream, separated by `separator` (a form feed, so each prints on its own page).
+def merge(app, template: Template, rows: Iterable[tuple[int, object]], out_stream: TextIO,
+          separator: str = "\f", on_reject = None) -> int:
+    count = 0
+    for _, document in render_cases(app, template, rows, on_reject):
+        if count:
+            out_stream.write(separator)
+        out_stream.write(document)
+        count += 1
+    return count
+
+
+## `python main.py merge letter.txt cases.csv -o letters.txt` or `--output-dir letters/` for one file per case.
+def main(argv: Optional[list[str]] = None, app = None) -> int:
+    import argparse
+    import sys
+
+    from batch import close_streams, detect_format, open_stream, read_rows, reject_line
+
+    parser = argparse.ArgumentParser(prog = "merge",
+                                     description = "Merge a document template with a file of cases.")
+    parser.add_argument("template", help = "Template file.")
+    parser.add_argument("input", nargs = "?", default = "-", help = "Cases (.csv or .jsonl). '-' for stdin.")
+    parser.add_argument("-o", "--output", default = "-",
+                        help = "One file with every document, separated by form feeds. Defaults to stdout.")
+    parser.add_argument("--output-dir", default = None, help = "Write one <case_id>.txt file per case instead.")
+    parser.add_argument("-r", "--rejects", default = None, help = "Reject file (JSON lines). Defaults to stderr.")
+    parser.add_argument("-f", "--format", choices = ("csv", "jsonl"), default = None,
+                        help = "Input format. Detected from the file extension if omitted.")
+    args = parser.parse_args(argv)
+
+    try:
+        template = load_template(args.template)
+    except (OSError, TemplateError) as e:
+        print(f"error: {e}", file = sys.stderr)
+        return 2
+
+    if app is None:
+        from main import App
+        app = App()
+
+    fmt = detect_format(None if args.input == "-" else args.input, args.format)
+    in_stream = open_stream(args.input, "r", sys.stdin)
+    reject_stream = open_stream(args.rejects, "w", sys.stderr)
+
+    def reject(line_number: int, error: Exception, row) -> None:
+        reject_stream.write(reject_line(line_number, error, row))
+
+    out_stream = None
+    try:
+        rows = read_rows(in_stream, fmt)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok = True)
+            count = 0
+            for case_id, document in render_cases(app, template, rows, reject):
+                name = re.sub(r"[^A-Za-z0-9_.-]", "_", case_id) + ".txt"
+                with open(os.path.join(args.output_dir, name), "w", encoding = "utf-8") as f:
+                    f.write(document)
+                count += 1
+        else:
+            out_stream = open_stream(args.output, "w", sys.stdout)
+            count = merge(app, template, rows, out_stream, on_reject = reject)
+    finally:
+        close_streams(in_stream, out_stream, reject_stream)
+
+    print(f"Merged {count} documents", file = sys.stderr)
+    return 0
@@ -0,0 +1,55 @@
+## The per-period calculation (method="periods", the default) must give the same cents as the day-by-day
+## reference loop (method="daily") it replaced. Run with `python -m pytest tests` or
+## `python -m unittest discover tests`.
+import os
+import random
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import App  # noqa: E402
+from series_registry import DEFAULT_SERIES_ID  # noqa: E402
+
+
+class PeriodsMatchDailyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = App()
+        series = cls.app.db.rate_series[DEFAULT_SERIES_ID]
+        cls.effective_dates = [date.fromordinal(ordinal) for ordinal in series.ordinals]
+
+    def assert_methods_agree(self, principal: float, start_date: date, end_date: date, judgment_date: date):
+        periods = self.app.calculate_interest(principal, start_date, end_date, judgment_date, method = "periods")
+        daily = self.app.calculate_interest(principal, start_date, end_date, judgment_date, method = "daily")
+        self.assertEqual(periods, daily, f"{principal} from {start_date} to {end_date}, judgment {judgment_date}")
+
+    def test_random_cases(self):
+        rng = random.Random(20111001)
+        first = self.effective_dates[0]
+        span = (date(2030, 12, 31) - first).days
+        for _ in range(2000):
+            start_date = first + timedelta(days = rng.randint(0, span))
+            end_date = start_date + timedelta(days = rng.randint(0, 5000))
+            judgment_date = start_date - timedelta(days = rng.choice((0, 0, rng.randint(0, 400))))
+            principal = round(rng.uniform(0.01, 2_000_000), 2)
+            self.assert_methods_agree(principal, start_date, end_date, judgment_date)
+
+    # Spans that start, end or turn over exactly on a rate change, where an off-by-one day would show
+    def test_rate_change_boundaries(self):
+        for effective in self.effective_dates[1:]:
+            for start_date, end_date in ((effective, effective),
+                                         (effective - timedelta(days = 1), effective),
+                                         (effective, effective + timedelta(days = 400)),
+                                         (effective - timedelta(days = 400), effective - timedelta(days = 1))):
+                self.assert_methods_agree(123_456.78, start_date, end_date, start_date)
+
+    def test_static_rate_cutoff(self):
+        for start_date in (date(2011, 9, 30), date(2011, 10, 1)):
+            self.assert_methods_agree(10_000.0, start_date, date(2025, 12, 31), start_date)
+            self.assert_methods_agree(10_000.0, start_date, date(2025, 12, 31), date(2008, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+## Schedule lines must add up to calculate_interest to the cent, and cover the judgment interval day by day.
+import os
+import random
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import App  # noqa: E402
+from schedule import iter_interest_schedule  # noqa: E402
+from series_registry import DEFAULT_SERIES_ID  # noqa: E402
+
+
+class ScheduleMatchesInterestTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = App()
+        cls.first_date = date.fromordinal(cls.app.db.rate_series[DEFAULT_SERIES_ID].ordinals[0])
+
+    def assert_schedule_matches(self, principal: float, start_date: date, end_date: date, judgment_date: date):
+        lines = list(iter_interest_schedule(self.app, principal, start_date, end_date, judgment_date))
+        interest = self.app.calculate_interest(principal, start_date, end_date, judgment_date)
+        case = f"{principal} from {start_date} to {end_date}, judgment {judgment_date}"
+        if not lines:
+            self.assertEqual(interest, 0.0, case)
+            return
+
+        self.assertEqual(lines[-1].cumulative_interest, interest, case)
+        self.assertEqual(round(sum(round(line.interest * 100) for line in lines)), round(interest * 100), case)
+        self.assertEqual(lines[0].period_start, start_date, case)
+        self.assertEqual(lines[-1].period_end, end_date, case)
+        for before, after in zip(lines, lines[1:]):
+            self.assertEqual(after.period_start, before.period_end + timedelta(days = 1), case)
+        self.assertEqual(sum(line.days for line in lines), (end_date - start_date).days + 1, case)
+
+    def test_random_cases(self):
+        rng = random.Random(18)
+        span = (date(2030, 12, 31) - self.first_date).days
+        for _ in range(3000):
+            start_date = self.first_date + timedelta(days = rng.randint(0, span))
+            end_date = start_date + timedelta(days = rng.randint(0, 8000))
+            judgment_date = start_date - timedelta(days = rng.choice((0, 0, rng.randint(0, 400))))
+            principal = round(rng.uniform(0.01, 2_000_000), 2)
+            self.assert_schedule_matches(principal, start_date, end_date, judgment_date)
+
+    def test_before_first_rate(self):
+        start_date = self.first_date - timedelta(days = 30)
+        self.assert_schedule_matches(10_000.0, start_date, start_date + timedelta(days = 60), start_date)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+## The solvers must agree with forward calculation: date_interest_reaches() returns the first day on which
+## calculate_interest_cents() reaches the target, and payoff_on() the same interest through as_of.
+import os
+import random
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import App  # noqa: E402
+from series_registry import DEFAULT_SERIES_ID  # noqa: E402
+from solvers import date_interest_reaches, payoff_on  # noqa: E402
+
+
+class SolversMatchForwardTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = App()
+        cls.first_date = date.fromordinal(cls.app.db.rate_series[DEFAULT_SERIES_ID].ordinals[0])
+
+    def interest_cents(self, principal_cents: int, start_date: date, end_date: date, judgment_date: date) -> int:
+        return self.app.calculate_interest_cents(principal_cents, start_date, end_date, judgment_date)
+
+    def random_case(self, rng: random.Random) -> tuple[int, date, date]:
+        start_date = self.first_date + timedelta(days = rng.randint(0, (date(2030, 12, 31) - self.first_date).days))
+        judgment_date = start_date - timedelta(days = rng.choice((0, 0, rng.randint(0, 400))))
+        # A judgment date before the first rate has no static rate: nothing accrues and nothing is reached
+        return rng.randint(1, 200_000_000), start_date, max(judgment_date, self.first_date)
+
+    def test_date_interest_reaches(self):
+        rng = random.Random(19)
+        for _ in range(1000):
+            principal_cents, start_date, judgment_date = self.random_case(rng)
+            horizon = start_date + timedelta(days = rng.randint(0, 6000))
+            target_cents = rng.randint(0, max(self.interest_cents(principal_cents, start_date, horizon,
+                                                                  judgment_date), 1))
+            reaches = date_interest_reaches(self.app, principal_cents, target_cents, start_date, judgment_date)
+            case = f"{principal_cents} cents from {start_date}, judgment {judgment_date}, target {target_cents}"
+
+            self.assertIsNotNone(reaches, case)
+            self.assertGreaterEqual(self.interest_cents(principal_cents, start_date, reaches, judgment_date),
+                                    target_cents, case)
+            if reaches > start_date:
+                self.assertLess(self.interest_cents(principal_cents, start_date, reaches - timedelta(days = 1),
+                                                    judgment_date), target_cents, case)
+
+    def test_payoff_on(self):
+        rng = random.Random(2019)
+        for _ in range(1000):
+            principal_cents, start_date, judgment_date = self.random_case(rng)
+            as_of = start_date + timedelta(days = rng.randint(0, 6000))
+            payoff = payoff_on(self.app, principal_cents, start_date, as_of, judgment_date)
+            interest = self.interest_cents(principal_cents, start_date, as_of, judgment_date)
+            self.assertEqual(payoff.interest_cents, interest)
+            self.assertEqual(payoff.payoff_cents, principal_cents + interest)
+
+    def test_target_past_date_max(self):
+        self.assertIsNone(date_interest_reaches(self.app, 100_000, 10 ** 32, date(2020, 1, 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+## calculate_interest_many (vectorized.py) must give the same cents as calculate_interest, including amounts
+## that sit next to a half cent, where np.round and round() disagree.
+import os
+import random
+import sys
+import unittest
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from main import App  # noqa: E402
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class VectorizedMatchesScalarTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = App()
+
+    def test_half_cent_case(self):
+        # np.round gave 843532.30 here
+        case = (903875.00, date(1988, 9, 2), date(1996, 5, 2))
+        many = self.app.calculate_interest_many([case[0]], [case[1]], [case[2]])
+        self.assertEqual(float(many[0]), self.app.calculate_interest(*case, case[1]))
+        self.assertEqual(float(many[0]), 843532.31)
+
+    def test_random_cases(self):
+        rng = random.Random(4)
+        principals, starts, ends, judgments = [], [], [], []
+        for _ in range(50_000):
+            start_date = date(1982, 1, 1) + timedelta(days = rng.randint(0, 17000))
+            principals.append(round(rng.uniform(0.01, 2_000_000), 2))
+            starts.append(start_date)
+            ends.append(start_date + timedelta(days = rng.randint(0, 6000)))
+            judgments.append(start_date - timedelta(days = rng.choice((0, 0, rng.randint(0, 400)))))
+
+        many = self.app.calculate_interest_many(principals, starts, ends, judgments)
+        for i, value in enumerate(many.tolist()):
+            expected = self.app.calculate_interest(principals[i], starts[i], ends[i], judgments[i])
+            self.assertEqual(value, expected, f"{principals[i]} from {starts[i]} to {ends[i]}, "
+                                              f"judgment {judgments[i]}")
+
+    def test_round_cents(self):
+        from vectorized import round_cents
+
+        values = np.random.default_rng(5).uniform(-1e7, 1e7, 100_000)
+        values[:3] = (843532.305, 0.125, 1e15 + 0.5)
+        self.assertEqual(round_cents(values).tolist(), [round(value, 2) for value in values.tolist()])
+
+
+if __name__ == "__main__":
+    unittest.main()
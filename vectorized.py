@@ -0,0 +1,118 @@
+## Vectorized interest calculation over arrays of judgments.
+## NumPy is optional for the rest of CaseFlow, so it is only required once this module is imported.
+from datetime import date
+from weakref import WeakKeyDictionary
+
+try:
+    import numpy as np
+except ImportError as e:  # pragma: no cover - depends on the environment
+    raise ImportError("The vectorized interest calculator requires NumPy (pip install numpy).") from e
+
+
+# Offset between numpy datetime64[D] (days since 1970-01-01) and date.toordinal()
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+## Day-by-day view of one rate series, built once from a RateDatabase.rate_series entry (rates.RateSeries).
+## daily[k] is the daily rate on day first_ordinal + k.
+## cumulative[k] is the sum of daily rates for the k days before first_ordinal + k (cumulative[0] == 0).
+## The calendar ends on the last effective date; later days use the last rate, as get_rate_as_of does.
+class RateCalendar:
+    def __init__(self, rate_series):
+        if not rate_series:
+            raise ValueError("Cannot build a rate calendar from an empty series")
+
+        # Read the columns in place; only the derived arrays below are kept, so the views are released
+        ordinal_view, _, daily_view = rate_series.columns()
+        effective = np.frombuffer(ordinal_view, dtype = np.int32).astype(np.int64)
+        rates = np.frombuffer(daily_view, dtype = np.float64)
+
+        # Each rate covers the days up to the next effective date; the last one covers its own day here.
+        lengths = np.append(np.diff(effective), 1)
+
+        self.first_ordinal = int(effective[0])
+        self.size = int(lengths.sum())
+        self.row_count = len(rate_series)
+        self.daily = np.repeat(rates, lengths)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self.daily)))
+        self.last_daily = float(rates[-1])
+
+    ## Sum of daily rates for every day before each ordinal. Days before the first rate contribute nothing.
+    def rate_sum_before(self, ordinals):
+        k = ordinals - self.first_ordinal
+        inside = self.cumulative[np.clip(k, 0, self.size)]
+        past_end = self.cumulative[self.size] + (k - self.size) * self.last_daily
+        return np.where(k > self.size, past_end, inside)
+
+    ## Daily rate in effect on each ordinal, 0.0 before the first rate.
+    def daily_rate_on(self, ordinals):
+        k = ordinals - self.first_ordinal
+        rates = self.daily[np.clip(k, 0, self.size - 1)]
+        return np.where(k < 0, 0.0, rates)
+
+
+_calendars: "WeakKeyDictionary[object, dict[str, RateCalendar]]" = WeakKeyDictionary()
+
+
+## Returns the cached calendar for a series, rebuilding it if rates were added since it was built.
+def get_calendar(db, series_id: str) -> RateCalendar:
+    series = db.rate_series.get(series_id)
+    if not series:
+        raise ValueError(f"No rates found for series {series_id}")
+
+    per_db = _calendars.setdefault(db, {})
+    calendar = per_db.get(series_id)
+    if calendar is None or calendar.row_count != len(series):
+        calendar = RateCalendar(series)
+        per_db[series_id] = calendar
+    return calendar
+
+
+## Converts a sequence of dates (date objects, datetime64 values or day ordinals) into an int64 ordinal array.
+def to_ordinals(values):
+    arr = np.asarray(values)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype("datetime64[D]").astype(np.int64) + _EPOCH_ORDINAL
+    if np.issubdtype(arr.dtype, np.integer):
+        return arr.astype(np.int64)
+    return np.fromiter((d.toordinal() for d in arr.ravel()), dtype = np.int64, count = arr.size).reshape(arr.shape)
+
+
+## Rounds every element to cents exactly as round(x, 2) does in the scalar path.
+## np.round(x, 2) rounds x * 100, and that product can land on the other side of a half cent (the float
+## nearest 843532.305 is just above the half, but gives 843532.30), so elements near a half cent, and values
+## too large for the check to be meaningful, are rounded again with round().
+def round_cents(values):
+    values = np.asarray(values, dtype = np.float64)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    with np.errstate(invalid = "ignore"):
+        recheck = (np.abs(scaled - np.floor(scaled) - 0.5) < 1e-3) | (np.abs(scaled) >= 2.0 ** 40)
+    for index in zip(*np.nonzero(recheck)):
+        rounded[index] = round(float(values[index]), 2)
+    return rounded
+
+
+## Vectorized equivalent of App.calculate_interest.
+## Judgments starting before static_rate_cutoff use the judgment-date rate for the whole span;
+## later ones accrue the rate in effect on each day. Start/End days are inclusive and results are rounded to cents.
+def calculate_interest_vectorized(db, series_id: str, principals, start_dates, end_dates, judgment_dates,
+                                  static_rate_cutoff: date):
+    calendar = get_calendar(db, series_id)
+
+    principal = np.asarray(principals, dtype = np.float64)
+    start = to_ordinals(start_dates)
+    end = to_ordinals(end_dates)
+    judgment = to_ordinals(judgment_dates)
+
+    days_inclusive = end - start + 1
+
+    # Pre-cutoff: single static rate, taken on the judgment date
+    static_interest = principal * calendar.daily_rate_on(judgment) * days_inclusive
+
+    # Post-cutoff: sum of the daily rates over [start, end]
+    accrued = principal * (calendar.rate_sum_before(end + 1) - calendar.rate_sum_before(start))
+    accrued = np.where((days_inclusive <= 0) | (start < calendar.first_ordinal), 0.0, accrued)
+
+    interest = np.where(start < static_rate_cutoff.toordinal(), static_interest, accrued)
+    return round_cents(interest)